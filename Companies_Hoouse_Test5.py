@@ -2,47 +2,65 @@ import asyncio
 import aiohttp
 import json
 
-# Replace with your actual Companies House API key
-API_KEY = "03ed5851-da50-4a59-9c87-d903055fd3e6"
+from api_key_pool import key_pool
+from crawl_journal import CrawlJournal
+from crawl_planner import SEARCH_RESULT_CAP, crawl_companies_by_name
+
 BASE_URL = "https://api.company-information.service.gov.uk"
 
 
-async def search_companies_by_name(session, company_name, items_per_page=50):
+async def search_companies_by_name(session, company_name, items_per_page=50, journal=None):
     """
     Search for companies by name with pagination using Companies House API.
 
     :param session: The aiohttp session object.
     :param company_name: The keyword to search for in company names.
     :param items_per_page: Number of results per page (max 50).
+    :param journal: Optional CrawlJournal; pages already in it are not fetched again.
     :return: List of matching companies with their basic information.
     """
     all_companies = []
     start_index = 0
 
     while True:
-        url = f"{BASE_URL}/search/companies"
-        params = {
-            "q": company_name,
-            "items_per_page": items_per_page,
-            "start_index": start_index
-        }
-
-        # Fetch the search results with a GET request
-        async with session.get(url, params=params, auth=aiohttp.BasicAuth(API_KEY, "")) as response:
-            if response.status == 200:
+        companies = journal.page(start_index) if journal else None
+
+        if companies is None:
+            url = f"{BASE_URL}/search/companies"
+            params = {
+                "q": company_name,
+                "items_per_page": items_per_page,
+                "start_index": start_index
+            }
+
+            # Fetch the search results with a GET request
+            api_key = await key_pool.acquire_async()
+            async with session.get(url, params=params, auth=aiohttp.BasicAuth(api_key, "")) as response:
+                key_pool.record(api_key, response.status, response.headers)
+                if response.status != 200:
+                    print(f"Failed to search companies by name. HTTP Status Code: {response.status}")
+                    break
+
                 result = await response.json()
                 companies = result.get("items", [])
-                all_companies.extend(companies)
+                if journal:
+                    journal.page_done(start_index, companies)
 
-                # If the number of companies returned is less than the items per page, we've reached the last page.
-                if len(companies) < items_per_page:
-                    break
+        all_companies.extend(companies)
 
-                # Otherwise, move to the next page.
-                start_index += items_per_page
-            else:
-                print(f"Failed to search companies by name. HTTP Status Code: {response.status}")
-                break
+        # If the number of companies returned is less than the items per page, we've reached the last page.
+        if len(companies) < items_per_page:
+            break
+
+        # Otherwise, move to the next page.
+        start_index += items_per_page
+        if start_index >= SEARCH_RESULT_CAP:
+            break
+
+    if start_index >= SEARCH_RESULT_CAP:
+        print(f"Search results reached the {SEARCH_RESULT_CAP} result cap; crawling the rest by partition.")
+        known_numbers = [company["company_number"] for company in all_companies]
+        all_companies.extend(await asyncio.to_thread(crawl_companies_by_name, company_name, known_numbers))
 
     return all_companies
 
@@ -56,7 +74,9 @@ async def extract_company_details(session, company_number):
     :return: Detailed company information.
     """
     url = f"{BASE_URL}/company/{company_number}"
-    async with session.get(url, auth=aiohttp.BasicAuth(API_KEY, "")) as response:
+    api_key = await key_pool.acquire_async()
+    async with session.get(url, auth=aiohttp.BasicAuth(api_key, "")) as response:
+        key_pool.record(api_key, response.status, response.headers)
         if response.status == 200:
             return await response.json()
         else:
@@ -64,47 +84,70 @@ async def extract_company_details(session, company_number):
             return None
 
 
+async def fetch_and_record(session, journal, company_number):
+    """
+    Fetch a company's details and record the outcome in the crawl journal.
+    """
+    details = await extract_company_details(session, company_number)
+    if details:
+        journal.company_done(company_number, details)
+    else:
+        journal.company_failed(company_number, "details request failed")
+    return details
+
+
 async def main():
     company_name = "UKPA"  # Replace with the company name you are searching for
+    journal_path = f"crawl_{company_name}.journal"  # Progress is kept here so an interrupted run can resume
 
-    async with aiohttp.ClientSession() as session:
-        # Step 1: Get the list of companies using pagination
-        print(f"Searching for companies named '{company_name}'...\n")
-        companies = await search_companies_by_name(session, company_name)
+    with CrawlJournal(journal_path) as journal:
+        async with aiohttp.ClientSession() as session:
+            # Step 1: Get the list of companies using pagination
+            print(f"Searching for companies named '{company_name}'...\n")
+            companies = await search_companies_by_name(session, company_name, journal=journal)
+
+            if not companies:
+                print("No companies found.")
+                return
 
-        if not companies:
-            print("No companies found.")
-        else:
             print(f"\nTotal companies found: {len(companies)}")
+            pending = set(journal.pending([company["company_number"] for company in companies]))
+            print(f"Already fetched: {len(companies) - len(pending)}, retrying failed: {len(journal.failures)}")
             print("Fetching details for each company...\n")
 
-            # Step 2: Fetch details for each company concurrently
+            # Step 2: Fetch details for the companies not in the journal yet, concurrently
             tasks = []
             for company in companies:
                 company_name = company["title"]
                 company_number = company["company_number"]
+                if company_number not in pending:
+                    continue
                 print(f"Fetching details for {company_name} ({company_number})...")
 
                 # Create a task to fetch details asynchronously
-                task = extract_company_details(session, company_number)
+                task = fetch_and_record(session, journal, company_number)
                 tasks.append(task)
 
             # Run all the tasks concurrently
-            company_details = await asyncio.gather(*tasks)
-
-            # Step 3: Process or print the company details
-            for details in company_details:
-                if details:
-                    print(f"\nCompany Name: {details.get('company_name', 'N/A')}")
-                    print(f"Company Number: {details.get('company_number', 'N/A')}")
-                    print(f"Registered Office Address: {details.get('registered_office_address', 'N/A')}")
-                    print(f"Company Status: {details.get('company_status', 'N/A')}")
-                    print(f"Company Type: {details.get('company_type', 'N/A')}")
-                    print(f"Incorporated On: {details.get('date_of_creation', 'N/A')}")
-                    print(f"SIC Codes: {', '.join(details.get('sic_codes', []))}")
-                    print("\n---\n")
-                else:
-                    print(f"Failed to fetch details for a company.\n")
+            await asyncio.gather(*tasks)
+
+        # Step 3: Process or print the company details
+        for company in companies:
+            details = journal.companies.get(company["company_number"])
+            if details:
+                print(f"\nCompany Name: {details.get('company_name', 'N/A')}")
+                print(f"Company Number: {details.get('company_number', 'N/A')}")
+                print(f"Registered Office Address: {details.get('registered_office_address', 'N/A')}")
+                print(f"Company Status: {details.get('company_status', 'N/A')}")
+                print(f"Company Type: {details.get('company_type', 'N/A')}")
+                print(f"Incorporated On: {details.get('date_of_creation', 'N/A')}")
+                print(f"SIC Codes: {', '.join(details.get('sic_codes', []))}")
+                print("\n---\n")
+            else:
+                print(f"Failed to fetch details for {company['company_number']}.\n")
+
+        if journal.failures:
+            print(f"{len(journal.failures)} companies failed; run again to retry them.")
 
 
 # Start the asynchronous event loop
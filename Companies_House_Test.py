@@ -1,6 +1,5 @@
-import requests
+from api_key_pool import key_pool
 
-API_KEY = "03ed5851-da50-4a59-9c87-d903055fd3e6"
 BASE_URL = "https://api.company-information.service.gov.uk"
 
 
@@ -12,7 +11,7 @@ def fetch_company_data(company_number):
     :return: JSON response from the API or None if the request fails.
     """
     url = f"{BASE_URL}/company/{company_number}"
-    response = requests.get(url, auth=(API_KEY, ""))  # Auth requires username (API key) and blank password.
+    response = key_pool.get(url)  # The pool picks the API key and sends it as the Basic auth username.
 
     if response.status_code == 200:
         return response.json()
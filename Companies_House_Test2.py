@@ -1,7 +1,5 @@
-import requests
+from api_key_pool import key_pool
 
-# Companies House API key
-API_KEY = "03ed5851-da50-4a59-9c87-d903055fd3e6"  # Replace with your actual Companies House API key
 BASE_URL = "https://api.company-information.service.gov.uk"
 
 
@@ -14,7 +12,7 @@ def search_companies_by_name(company_name):
     """
     url = f"{BASE_URL}/search/companies"
     params = {"q": company_name}
-    response = requests.get(url, params=params, auth=(API_KEY, ""))
+    response = key_pool.get(url, params=params)
 
     if response.status_code == 200:
         companies = response.json().get("items", [])
@@ -36,7 +34,7 @@ def fetch_company_overview(company_number):
     :return: JSON response with detailed overview or None if request fails.
     """
     url = f"{BASE_URL}/company/{company_number}"
-    response = requests.get(url, auth=(API_KEY, ""))
+    response = key_pool.get(url)
 
     if response.status_code == 200:
         return response.json()
@@ -1,45 +1,59 @@
-import requests
+from api_key_pool import key_pool
+from crawl_journal import CrawlJournal
+from crawl_planner import SEARCH_RESULT_CAP, crawl_companies_by_name
 
-# Companies House API key
-API_KEY = "03ed5851-da50-4a59-9c87-d903055fd3e6"  # Replace with your actual Companies House API key
 BASE_URL = "https://api.company-information.service.gov.uk"
 
-def search_companies_by_name(company_name, items_per_page=50):
+def search_companies_by_name(company_name, items_per_page=50, journal=None):
     """
     Search for companies by name with pagination using Companies House API.
 
     :param company_name: The keyword to search for in company names.
     :param items_per_page: Number of results per page (max 50).
+    :param journal: Optional CrawlJournal; pages already in it are not fetched again.
     :return: List of matching companies with their basic information.
     """
     all_companies = []
     start_index = 0
 
     while True:
-        url = f"{BASE_URL}/search/companies"
-        params = {
-            "q": company_name,
-            "items_per_page": items_per_page,
-            "start_index": start_index
-        }
-        response = requests.get(url, params=params, auth=(API_KEY, ""))
-
-        if response.status_code == 200:
-            result = response.json()
-            companies = result.get("items", [])
-            all_companies.extend(companies)
-
-            # If the number of companies returned is less than the items per page, we've reached the last page.
-            if len(companies) < items_per_page:
+        companies = journal.page(start_index) if journal else None
+
+        if companies is None:
+            url = f"{BASE_URL}/search/companies"
+            params = {
+                "q": company_name,
+                "items_per_page": items_per_page,
+                "start_index": start_index
+            }
+            response = key_pool.get(url, params=params)
+
+            if response.status_code != 200:
+                print(f"Failed to search companies by name. HTTP Status Code: {response.status_code}")
+                print(response.text)
                 break
 
-            # Otherwise, move to the next page.
-            start_index += items_per_page
-        else:
-            print(f"Failed to search companies by name. HTTP Status Code: {response.status_code}")
-            print(response.text)
+            companies = response.json().get("items", [])
+            if journal:
+                journal.page_done(start_index, companies)
+
+        all_companies.extend(companies)
+
+        # If the number of companies returned is less than the items per page, we've reached the last page.
+        if len(companies) < items_per_page:
+            break
+
+        # Otherwise, move to the next page.
+        start_index += items_per_page
+        if start_index >= SEARCH_RESULT_CAP:
             break
 
+    if start_index >= SEARCH_RESULT_CAP:
+        # The plain search stops here; partition the rest of the crawl through the advanced search API.
+        print(f"Search results reached the {SEARCH_RESULT_CAP} result cap; crawling the rest by partition.")
+        known_numbers = [company["company_number"] for company in all_companies]
+        all_companies.extend(crawl_companies_by_name(company_name, known_numbers))
+
     return all_companies
 
 
@@ -51,7 +65,7 @@ def extract_company_details(company_number):
     :return: Detailed company information.
     """
     url = f"{BASE_URL}/company/{company_number}"
-    response = requests.get(url, auth=(API_KEY, ""))
+    response = key_pool.get(url)
 
     if response.status_code == 200:
         return response.json()
@@ -63,27 +77,45 @@ def extract_company_details(company_number):
 
 def main():
     company_name = "UKPA"  # Replace with the company name you are searching for
-    companies = search_companies_by_name(company_name)
+    journal_path = f"crawl_{company_name}.journal"  # Progress is kept here so an interrupted run can resume
+
+    with CrawlJournal(journal_path) as journal:
+        companies = search_companies_by_name(company_name, journal=journal)
+
+        if not companies:
+            print("No companies found.")
+            return
 
-    if not companies:
-        print("No companies found.")
-    else:
         print(f"\nTotal companies found: {len(companies)}")
+        pending = set(journal.pending([company["company_number"] for company in companies]))
+        print(f"Already fetched: {len(companies) - len(pending)}, retrying failed: {len(journal.failures)}")
         print("Fetching details for each company...\n")
 
-        # Loop through all companies and fetch their details
+        # Loop through all companies and fetch the details that are not in the journal yet
         for company in companies:
             company_name = company["title"]
             company_number = company["company_number"]
+            if company_number not in pending:
+                continue
             print(f"Fetching details for {company_name} ({company_number})...")
 
             # Get detailed information for each company
             company_details = extract_company_details(company_number)
 
             if company_details:
-                print(company_details)  # You can modify this to process or save the details
+                journal.company_done(company_number, company_details)
+            else:
+                journal.company_failed(company_number, "details request failed")
             print("\n---\n")
 
+        for company in companies:
+            company_details = journal.companies.get(company["company_number"])
+            if company_details:
+                print(company_details)  # You can modify this to process or save the details
+
+        if journal.failures:
+            print(f"\n{len(journal.failures)} companies failed; run again to retry them.")
+
 
 if __name__ == "__main__":
     main()
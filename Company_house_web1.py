@@ -1,15 +1,17 @@
 import asyncio
 import aiohttp
-from flask import Flask, request, jsonify, send_file
-import pandas as pd
-import io
+from flask import Flask, Response, request, jsonify
 import json
 
+from api_key_pool import key_pool
+from crawl_planner import SEARCH_RESULT_CAP
+from exporters import ExporterUnavailable, get_exporter
+import request_profiler
+
 # Flask app initialization
 app = Flask(__name__)
+request_profiler.init_app(app)
 
-# Replace with your actual Companies House API key
-API_KEY = "03ed5851-da50-4a59-9c87-d903055fd3e6"
 BASE_URL = "https://api.company-information.service.gov.uk"
 
 
@@ -27,7 +29,9 @@ async def search_companies(session, search_term, search_type="name", items_per_p
         elif search_type == "sic":
             params = {"q": f"sic_code:{search_term}"}
 
-        async with session.get(url, params=params, auth=aiohttp.BasicAuth(API_KEY, "")) as response:
+        api_key = await key_pool.acquire_async()
+        async with session.get(url, params=params, auth=aiohttp.BasicAuth(api_key, "")) as response:
+            key_pool.record(api_key, response.status, response.headers)
             if response.status == 200:
                 result = await response.json()
                 companies = result.get("items", [])
@@ -36,6 +40,11 @@ async def search_companies(session, search_term, search_type="name", items_per_p
                 if len(companies) < items_per_page:
                     break
                 start_index += items_per_page
+                if start_index >= SEARCH_RESULT_CAP:
+                    # Crawling past the cap is left to companies_house_webApp2's exhaustive=1, which does not
+                    # fetch every profile within the request.
+                    print(f"Search results truncated at {SEARCH_RESULT_CAP} companies.")
+                    break
             else:
                 break
     return all_companies
@@ -44,7 +53,9 @@ async def search_companies(session, search_term, search_type="name", items_per_p
 # Function to get detailed company data
 async def get_company_details(session, company_number):
     url = f"{BASE_URL}/company/{company_number}"
-    async with session.get(url, auth=aiohttp.BasicAuth(API_KEY, "")) as response:
+    api_key = await key_pool.acquire_async()
+    async with session.get(url, auth=aiohttp.BasicAuth(api_key, "")) as response:
+        key_pool.record(api_key, response.status, response.headers)
         if response.status == 200:
             return await response.json()
         return None
@@ -87,28 +98,26 @@ async def search_companies_api():
         return jsonify(formatted_details)
 
 
-# Export the search results to CSV or Excel
+# Export the search results to CSV, Excel or any other registered format
 @app.route('/export', methods=['POST'])
 def export_to_file():
-    data = request.json
+    data = request.json or []
     file_type = request.args.get('file_type', 'csv')
 
-    if file_type == 'csv':
-        df = pd.DataFrame(data)
-        output = io.StringIO()
-        df.to_csv(output, index=False)
-        output.seek(0)
-        return send_file(output, mimetype='text/csv', as_attachment=True, download_name="companies.csv")
-
-    elif file_type == 'excel':
-        df = pd.DataFrame(data)
-        output = io.BytesIO()
-        df.to_excel(output, index=False, engine='openpyxl')
-        output.seek(0)
-        return send_file(output, mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-                         as_attachment=True, download_name="companies.xlsx")
-
-    return jsonify({"message": "Invalid file type."}), 400
+    if not isinstance(data, list) or not all(isinstance(row, dict) for row in data):
+        return jsonify({"message": "Export data must be a list of objects."}), 400
+
+    try:
+        exporter = get_exporter(file_type)
+        exporter.writer  # Load the backend now, so a missing dependency is reported before the download starts
+    except ValueError:
+        return jsonify({"message": "Invalid file type."}), 400
+    except ExporterUnavailable as error:
+        return jsonify({"message": str(error)}), 501
+
+    response = Response(exporter.export(data), mimetype=exporter.mimetype)
+    response.headers["Content-Disposition"] = f"attachment; filename=companies.{exporter.extension}"
+    return response
 
 
 # Run the Flask app
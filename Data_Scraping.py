@@ -1,7 +1,9 @@
 # import requests
 # import pandas as pd
 #
-# api_key = "15f9405a-7801-4f90-8c11-bc6180dd18ff"
+# from api_key_pool import key_pool
+#
+# api_key = key_pool.acquire()  # Add extra keys via COMPANIES_HOUSE_API_KEYS instead of hard-coding them here.
 #
 # company_numbers = [
 #     "14295314", "14295313", "14319761", "14339152", "14311212",
@@ -0,0 +1,341 @@
+import argparse
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from html.parser import HTMLParser
+
+from api_key_pool import key_pool
+from crawl_journal import CrawlJournal
+
+BASE_URL = "https://api.company-information.service.gov.uk"
+DOCUMENT_API_URL = "https://document-api.company-information.service.gov.uk"
+
+# Preferred document formats, best first. Only iXBRL carries tagged facts; PDFs are kept for reference.
+DOCUMENT_TYPES = {
+    "application/xhtml+xml": ".xhtml",
+    "application/pdf": ".pdf",
+}
+
+# Output columns mapped to the iXBRL concept names (without namespace prefix) they are read from, best first.
+FINANCIAL_CONCEPTS = {
+    "turnover": ["TurnoverRevenue", "Turnover", "Revenue"],
+    "net_assets": ["NetAssetsLiabilities", "NetAssetsLiabilitiesIncludingPensionAssetLiability"],
+    "employees": ["AverageNumberEmployeesDuringPeriod", "EmployeesTotal"],
+}
+
+COMPANY_NUMBER_CONCEPT = "UKCompaniesHouseRegisteredNumber"
+
+COLUMNS = ["company_number", "made_up_date", "source", "document", "period_end", *FINANCIAL_CONCEPTS]
+
+
+def list_accounts_filings(company_number):
+    """
+    List the accounts filings of a company that have a downloadable document.
+
+    :param company_number: The unique company number.
+    :return: List of dicts with company_number, made_up_date and document_id.
+    """
+    url = f"{BASE_URL}/company/{company_number}/filing-history"
+    response = key_pool.get(url, params={"category": "accounts", "items_per_page": 100})
+
+    if response.status_code != 200:
+        print(f"Failed to fetch filing history for {company_number}. HTTP Status Code: {response.status_code}")
+        return []
+
+    filings = []
+    for item in response.json().get("items", []):
+        metadata_url = item.get("links", {}).get("document_metadata")
+        if not metadata_url:
+            continue
+        filings.append({
+            "company_number": company_number,
+            "made_up_date": item.get("description_values", {}).get("made_up_date", item.get("date")),
+            "document_id": metadata_url.rstrip("/").rsplit("/", 1)[-1],
+        })
+    return filings
+
+
+def download_document(filing, target_dir):
+    """
+    Download the best available format of a filing's document, streaming it to disk.
+
+    :return: The filing dict extended with ``path`` and ``content_type``, or None if the download failed.
+    """
+    metadata_url = f"{DOCUMENT_API_URL}/document/{filing['document_id']}"
+    response = key_pool.get(metadata_url)
+    if response.status_code != 200:
+        print(f"Failed to fetch document metadata {filing['document_id']}. HTTP Status Code: {response.status_code}")
+        return None
+
+    resources = response.json().get("resources", {})
+    content_type = next((content_type for content_type in DOCUMENT_TYPES if content_type in resources), None)
+    if content_type is None:
+        return None
+
+    filename = f"{filing['company_number']}_{filing['made_up_date']}{DOCUMENT_TYPES[content_type]}"
+    path = os.path.join(target_dir, filename)
+    if not os.path.exists(path):
+        response = key_pool.get(f"{metadata_url}/content", headers={"Accept": content_type}, stream=True,
+                                timeout=(10, 60))
+        if response.status_code != 200:
+            print(f"Failed to download document {filing['document_id']}. HTTP Status Code: {response.status_code}")
+            return None
+
+        # Write to a temporary name first so an interrupted download is never mistaken for a complete one.
+        with open(path + ".part", "wb") as handle:
+            for chunk in response.iter_content(chunk_size=64 * 1024):
+                handle.write(chunk)
+        os.replace(path + ".part", path)
+
+    return dict(filing, path=path, content_type=content_type)
+
+
+def download_filings(company_numbers, target_dir, max_workers=8):
+    """
+    List and download the accounts documents of many companies concurrently.
+    """
+    os.makedirs(target_dir, exist_ok=True)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        filings = [filing for filings in executor.map(list_accounts_filings, company_numbers) for filing in filings]
+        documents = executor.map(lambda filing: download_document(filing, target_dir), filings)
+        return [document for document in documents if document]
+
+
+def fetch_profile(company_number):
+    response = key_pool.get(f"{BASE_URL}/company/{company_number}")
+    if response.status_code != 200:
+        print(f"Failed to fetch company profile for {company_number}. HTTP Status Code: {response.status_code}")
+        return None
+    return response.json()
+
+
+def fetch_profiles(company_numbers, max_workers=8):
+    """
+    Fetch company profiles concurrently, for joining onto the financials.
+
+    :return: Dict of company number to profile JSON, for the companies that could be fetched.
+    """
+    company_numbers = list(dict.fromkeys(company_numbers))
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        profiles = executor.map(fetch_profile, company_numbers)
+        return {number: profile for number, profile in zip(company_numbers, profiles) if profile}
+
+
+def load_profiles(path):
+    """
+    Load company profiles from a crawl journal, or from a JSON file holding a list of profiles or a mapping of
+    company number to profile.
+    """
+    if path.endswith(".journal"):
+        return dict(CrawlJournal.read(path).companies)
+
+    with open(path, encoding="utf-8") as handle:
+        data = json.load(handle)
+    if isinstance(data, list):
+        return {profile["company_number"]: profile for profile in data if profile.get("company_number")}
+    return data
+
+
+class IXBRLFactParser(HTMLParser):
+    """
+    Collect numeric facts, non-numeric facts and contexts from an inline XBRL document.
+
+    Facts may be nested (an ix:nonFraction inside an ix:nonNumeric text block); each one is collected, and an
+    outer fact's text includes the text of the facts inside it.
+    """
+
+    FACT_TAGS = ("ix:nonfraction", "ix:nonnumeric")
+
+    def __init__(self):
+        super().__init__()
+        self.facts = []
+        self.contexts = {}
+        self._open_facts = []
+        self._context = None
+        self._context_field = None
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag in self.FACT_TAGS:
+            self._open_facts.append({"tag": tag, "attrs": attrs, "text": ""})
+        elif self._open_facts:
+            pass
+        elif tag == "xbrli:context":
+            self._context = {"id": attrs.get("id"), "date": None, "dimensional": False}
+        elif self._context is not None:
+            if tag in ("xbrli:enddate", "xbrli:instant"):
+                self._context_field = "date"
+            elif tag in ("xbrli:segment", "xbrli:scenario"):
+                self._context["dimensional"] = True
+
+    def handle_endtag(self, tag):
+        if tag in self.FACT_TAGS and self._open_facts:
+            self.facts.append(self._open_facts.pop())
+        elif self._open_facts:
+            pass
+        elif tag == "xbrli:context" and self._context is not None:
+            self.contexts[self._context["id"]] = self._context
+            self._context = None
+        elif tag in ("xbrli:enddate", "xbrli:instant"):
+            self._context_field = None
+
+    def handle_data(self, data):
+        if self._open_facts:
+            for fact in self._open_facts:
+                fact["text"] += data
+        elif self._context is not None and self._context_field == "date":
+            self._context["date"] = data.strip()
+
+
+def fact_value(fact):
+    """
+    Numeric value of an ix:nonFraction fact, applying its format, scale and sign.
+    """
+    attrs = fact["attrs"]
+    text = fact["text"].strip()
+    # Transformation names are spelt "numcommadecimal" in the older registries and "num-comma-decimal" in ixt-4
+    format_name = attrs.get("format", "").lower().replace("-", "")
+    if "zerodash" in format_name or "fixedzero" in format_name or text in ("", "-"):
+        value = 0.0
+    else:
+        if "numcommadecimal" in format_name:
+            text = text.replace(".", "").replace(" ", "").replace(",", ".")
+        else:
+            text = text.replace(",", "").replace(" ", "")
+        value = float(text)
+
+    value *= 10 ** int(attrs.get("scale", 0) or 0)
+    if attrs.get("sign") == "-":
+        value = -value
+    return value
+
+
+def parse_financials(path):
+    """
+    Extract the headline financials from one accounts document.
+
+    Every value in a row belongs to one period: the latest non-dimensional period that any headline fact is
+    tagged against. Prior-year comparatives are ignored, and a figure only reported for another period is left
+    empty. Runs in worker processes, so it only takes and returns plain data.
+    """
+    row = dict.fromkeys(COLUMNS)
+    row["document"] = os.path.basename(path)
+    stem = os.path.splitext(row["document"])[0]
+    row["company_number"], _, row["made_up_date"] = stem.partition("_")
+    row["made_up_date"] = row["made_up_date"] or None
+
+    if not path.endswith((".xhtml", ".html", ".htm")):
+        row["source"] = "pdf"
+        return row
+    row["source"] = "ixbrl"
+
+    parser = IXBRLFactParser()
+    with open(path, encoding="utf-8", errors="replace") as handle:
+        for chunk in iter(lambda: handle.read(256 * 1024), ""):
+            parser.feed(chunk)
+    parser.close()
+
+    candidates = {}
+    for fact in parser.facts:
+        concept = fact["attrs"].get("name", "").rsplit(":", 1)[-1]
+        context = parser.contexts.get(fact["attrs"].get("contextref"), {})
+
+        if fact["tag"] == "ix:nonnumeric":
+            if concept == COMPANY_NUMBER_CONCEPT and fact["text"].strip():
+                row["company_number"] = fact["text"].strip()
+            continue
+        if context.get("dimensional"):
+            continue
+
+        try:
+            value = fact_value(fact)
+        except ValueError:
+            continue
+        candidates.setdefault(concept, {})[context.get("date") or ""] = value
+
+    headline = [concept for concepts in FINANCIAL_CONCEPTS.values() for concept in concepts if concept in candidates]
+    if not headline:
+        return row
+    period = max(date for concept in headline for date in candidates[concept])
+    row["period_end"] = period or None
+
+    for column, concepts in FINANCIAL_CONCEPTS.items():
+        for concept in concepts:
+            if period in candidates.get(concept, {}):
+                row[column] = candidates[concept][period]
+                break
+
+    return row
+
+
+def extract_financials(paths, max_workers=None):
+    """
+    Parse many documents in a process pool.
+    """
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(parse_financials, paths, chunksize=8))
+
+
+def write_columnar(rows, path, profiles=None):
+    """
+    Write financials to a Parquet table, optionally joined with company profile fields on company number.
+
+    :param rows: Rows returned by parse_financials.
+    :param path: Output .parquet file.
+    :param profiles: Optional mapping of company number to company profile JSON.
+    """
+    import pyarrow as pa  # Imported lazily; only the pipeline needs it
+    import pyarrow.parquet as pq
+
+    columns = {column: [row[column] for row in rows] for column in COLUMNS}
+    if profiles is not None:
+        columns["company_name"] = [profiles.get(row["company_number"], {}).get("company_name") for row in rows]
+        columns["company_status"] = [profiles.get(row["company_number"], {}).get("company_status") for row in rows]
+
+    table = pa.table(columns).sort_by([("company_number", "ascending"), ("made_up_date", "descending")])
+    pq.write_table(table, path)
+    return table
+
+
+def run_pipeline(company_numbers=None, documents_dir="accounts_documents", output="financials.parquet",
+                 max_workers=8, profiles=None):
+    """
+    Download accounts documents for the given companies and extract their financials.
+
+    Without company numbers, the documents already in ``documents_dir`` are parsed, which makes it possible to
+    run the pipeline against local fixture documents.
+
+    :param profiles: Optional mapping of company number to profile JSON, joined onto the output table.
+    """
+    if company_numbers:
+        paths = [document["path"] for document in download_filings(company_numbers, documents_dir, max_workers)]
+    else:
+        paths = [
+            os.path.join(documents_dir, name) for name in sorted(os.listdir(documents_dir))
+            if name.endswith((".xhtml", ".html", ".htm", ".pdf"))
+        ]
+
+    rows = extract_financials(paths)
+    write_columnar(rows, output, profiles)
+    print(f"Extracted financials from {len(rows)} documents into {output}")
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Extract financials from Companies House accounts filings.")
+    parser.add_argument("company_numbers", nargs="*", help="Companies to fetch; omit to parse documents_dir only")
+    parser.add_argument("--documents-dir", default="accounts_documents")
+    parser.add_argument("--output", default="financials.parquet")
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--profiles", help="Crawl journal or JSON file of company profiles to join on")
+    parser.add_argument("--fetch-profiles", action="store_true", help="Fetch the profiles to join on from the API")
+    args = parser.parse_args()
+
+    profiles = None
+    if args.profiles:
+        profiles = load_profiles(args.profiles)
+    elif args.fetch_profiles and args.company_numbers:
+        profiles = fetch_profiles(args.company_numbers, args.workers)
+
+    run_pipeline(args.company_numbers, args.documents_dir, args.output, args.workers, profiles)
@@ -0,0 +1,203 @@
+import asyncio
+import os
+import threading
+import time
+
+import requests
+
+# Companies House allows 600 requests per 5 minute window for each API key.
+DEFAULT_RATE_LIMIT = 600
+DEFAULT_RATE_WINDOW = 300
+
+KEYS_ENV_VAR = "COMPANIES_HOUSE_API_KEYS"
+KEYS_FILE_ENV_VAR = "COMPANIES_HOUSE_API_KEYS_FILE"
+
+
+class KeyPoolExhausted(RuntimeError):
+    """
+    Raised when no key can serve a request: every key is unhealthy, or spent for longer than the caller will wait.
+    """
+
+
+class KeyState:
+    """
+    Rate-limit and health state for a single API key.
+    """
+
+    def __init__(self, key, limit=DEFAULT_RATE_LIMIT, window=DEFAULT_RATE_WINDOW):
+        self.key = key
+        self.limit = limit
+        self.window = window
+        self.remaining = limit
+        self.reset_at = time.time() + window
+        self.healthy = True
+        self.last_status = None
+
+    def refresh(self, now):
+        """
+        Start a new window once the previous one has expired.
+        """
+        if now >= self.reset_at:
+            self.remaining = self.limit
+            self.reset_at = now + self.window
+
+    def describe(self):
+        return {
+            "key": f"{self.key[:4]}…{self.key[-4:]}",
+            "healthy": self.healthy,
+            "remaining": self.remaining,
+            "limit": self.limit,
+            "resetAt": self.reset_at,
+            "lastStatus": self.last_status,
+        }
+
+
+class KeyPool:
+    """
+    Pool of Companies House API keys.
+
+    Every request is routed to the healthy key with the most remaining budget in its rate-limit
+    window. Keys rejected with 401/403 are marked unhealthy and are no longer handed out.
+    """
+
+    def __init__(self, keys, limit=DEFAULT_RATE_LIMIT, window=DEFAULT_RATE_WINDOW):
+        if not keys:
+            raise ValueError("KeyPool needs at least one API key")
+        self._states = {key: KeyState(key, limit, window) for key in keys}
+        self._lock = threading.Lock()
+
+    @property
+    def keys(self):
+        return list(self._states)
+
+    def _pick(self):
+        """
+        Reserve one request on the best key.
+
+        :return: Tuple of (key, seconds to wait). The key is None when the caller has to wait.
+        """
+        now = time.time()
+        with self._lock:
+            healthy = [state for state in self._states.values() if state.healthy]
+            if not healthy:
+                raise KeyPoolExhausted("No healthy Companies House API keys left in the pool")
+
+            for state in healthy:
+                state.refresh(now)
+
+            best = max(healthy, key=lambda state: state.remaining)
+            if best.remaining > 0:
+                best.remaining -= 1
+                return best.key, 0
+
+            return None, max(0.0, min(state.reset_at for state in healthy) - now)
+
+    def acquire(self, max_wait=None):
+        """
+        Return the key with the most remaining budget, sleeping until a window resets if every key is spent.
+
+        :param max_wait: Longest total time in seconds to sleep for a key; None waits as long as it takes.
+        :raises KeyPoolExhausted: If no key is healthy, or none frees up within ``max_wait``.
+        """
+        deadline = None if max_wait is None else time.monotonic() + max_wait
+        while True:
+            key, wait = self._pick()
+            if key:
+                return key
+            if deadline is not None and time.monotonic() + wait > deadline:
+                raise KeyPoolExhausted(f"All Companies House API keys are spent for the next {wait:.0f}s")
+            time.sleep(wait)
+
+    async def acquire_async(self):
+        """
+        Same as acquire() but waits without blocking the event loop.
+        """
+        while True:
+            key, wait = self._pick()
+            if key:
+                return key
+            await asyncio.sleep(wait)
+
+    def record(self, key, status, headers=None):
+        """
+        Update a key's state from the response it received.
+
+        :param key: The API key used for the request.
+        :param status: HTTP status code of the response.
+        :param headers: Response headers; the X-Ratelimit-* headers are used when present.
+        """
+        with self._lock:
+            state = self._states.get(key)
+            if state is None:
+                return
+            state.last_status = status
+
+            if status in (401, 403):
+                state.healthy = False
+                print(f"API key {state.describe()['key']} rejected with HTTP {status}; marked unhealthy.")
+                return
+
+            headers = headers or {}
+            remain = headers.get("X-Ratelimit-Remain")
+            reset = headers.get("X-Ratelimit-Reset")
+            limit = headers.get("X-Ratelimit-Limit")
+            try:
+                if limit is not None:
+                    state.limit = int(limit)
+                if remain is not None:
+                    state.remaining = int(remain)
+                if reset is not None:
+                    state.reset_at = float(reset)
+            except ValueError:
+                pass
+
+            if status == 429:
+                state.remaining = 0
+
+    def get(self, url, max_wait=None, **kwargs):
+        """
+        Perform a GET request with the best available key and record the outcome.
+
+        :param max_wait: Passed to acquire().
+        """
+        key = self.acquire(max_wait)
+        response = requests.get(url, auth=(key, ""), **kwargs)
+        self.record(key, response.status_code, response.headers)
+        return response
+
+    def status(self):
+        with self._lock:
+            return [state.describe() for state in self._states.values()]
+
+
+def load_api_keys():
+    """
+    Load API keys from the environment or a key file.
+
+    COMPANIES_HOUSE_API_KEYS holds a comma-separated list of keys. COMPANIES_HOUSE_API_KEYS_FILE points to a
+    file with one key per line (blank lines and lines starting with '#' are ignored).
+
+    :raises RuntimeError: If neither provides a key.
+    """
+    keys = []
+
+    env_keys = os.environ.get(KEYS_ENV_VAR, "")
+    keys.extend(key.strip() for key in env_keys.split(",") if key.strip())
+
+    keys_file = os.environ.get(KEYS_FILE_ENV_VAR)
+    if keys_file:
+        with open(keys_file, encoding="utf-8") as handle:
+            for line in handle:
+                line = line.strip()
+                if line and not line.startswith("#"):
+                    keys.append(line)
+
+    # Preserve order but drop duplicates so a key is never counted twice.
+    keys = list(dict.fromkeys(keys))
+    if not keys:
+        raise RuntimeError(f"No Companies House API key configured. Set {KEYS_ENV_VAR} to a comma-separated list "
+                           f"of keys, or {KEYS_FILE_ENV_VAR} to a file with one key per line.")
+    return keys
+
+
+key_pool = KeyPool(load_api_keys())
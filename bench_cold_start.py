@@ -0,0 +1,133 @@
+"""
+Cold-start benchmark for the web apps.
+
+Imports each app in a fresh interpreter, serves one real search through the Flask test client against a local
+stub of the Companies House API, checks its status code and reports the wall time, the slowest imports (from
+``python -X importtime``) and whether any heavy export-only dependency was loaded. Exits non-zero if a heavy
+dependency shows up on the search path or an app takes longer than --max-startup-ms to start.
+
+Usage: python bench_cold_start.py [--max-startup-ms 1500] [app_module ...]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+APP_MODULES = ["companies_house_webApp2", "Company_house_web1"]
+
+# Search request made against each app, and the status it must answer with.
+SEARCH_PROBES = {
+    "companies_house_webApp2": ("/search?query=acme", 200),
+    "Company_house_web1": ("/search?search_term=acme", 200),
+}
+
+# Modules that only exports should ever need.
+HEAVY_MODULES = ["pandas", "numpy", "openpyxl", "pyarrow"]
+
+# Runs in the child interpreter: start the app, point it at a stub API, serve one search and report.
+PROBE = """
+import json, sys, time
+started = time.perf_counter()
+module = __import__({module!r})
+imported = time.perf_counter()
+
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+COMPANY = {{"company_number": "00000001", "company_name": "ACME LTD", "title": "ACME LTD",
+           "company_status": "active", "company_type": "ltd", "date_of_creation": "2000-01-01",
+           "address": {{}}, "registered_office_address": {{}}, "sic_codes": ["62012"]}}
+
+class StubAPI(BaseHTTPRequestHandler):
+    def do_GET(self):
+        body = COMPANY if self.path.startswith("/company/") else {{"hits": 1, "items": [COMPANY]}}
+        data = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+server = ThreadingHTTPServer(("127.0.0.1", 0), StubAPI)
+threading.Thread(target=server.serve_forever, daemon=True).start()
+module.BASE_URL = f"http://127.0.0.1:{{server.server_port}}"
+
+client = module.app.test_client()
+probe_started = time.perf_counter()
+response = client.get({path!r})
+served = time.perf_counter()
+print(json.dumps({{
+    "import_ms": (imported - started) * 1000,
+    "first_request_ms": (served - probe_started) * 1000,
+    "status": response.status_code,
+    "modules": sorted(sys.modules),
+}}))
+"""
+
+
+def slowest_imports(importtime_log, count=5):
+    """
+    Top imports by cumulative time from ``-X importtime`` output.
+    """
+    timings = []
+    for line in importtime_log.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        try:
+            timings.append((int(cumulative), name.strip()))
+        except ValueError:
+            continue  # Header line
+    return sorted(timings, reverse=True)[:count]
+
+
+def bench(module, path):
+    directory = os.path.dirname(os.path.abspath(__file__))
+    env = dict(os.environ)
+    env.setdefault("COMPANIES_HOUSE_API_KEYS", "bench-key")  # The probe only talks to the local stub server
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", PROBE.format(module=module, path=path)],
+                            cwd=directory, env=env, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"{module} failed to start:\n{result.stderr[-2000:]}")
+
+    report = json.loads(result.stdout.strip().splitlines()[-1])
+    modules = set(report.pop("modules"))
+    report["heavy"] = [name for name in HEAVY_MODULES if name in modules]
+    report["slowest"] = slowest_imports(result.stderr)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("modules", nargs="*", default=APP_MODULES)
+    parser.add_argument("--max-startup-ms", type=float, default=None)
+    args = parser.parse_args()
+
+    failed = False
+    for module in args.modules:
+        path, expected_status = SEARCH_PROBES.get(module, ("/search?query=acme", 200))
+        report = bench(module, path)
+        startup_ms = report["import_ms"] + report["first_request_ms"]
+        print(f"{module}: import {report['import_ms']:.0f} ms, first request {report['first_request_ms']:.0f} ms")
+        for cumulative, name in report["slowest"]:
+            print(f"    {cumulative / 1000:8.1f} ms  {name}")
+
+        if report["status"] != expected_status:
+            print(f"    FAIL: GET {path} answered {report['status']}, expected {expected_status}")
+            failed = True
+        if report["heavy"]:
+            print(f"    FAIL: search path imported {', '.join(report['heavy'])}")
+            failed = True
+        if args.max_startup_ms is not None and startup_ms > args.max_startup_ms:
+            print(f"    FAIL: startup took {startup_ms:.0f} ms (limit {args.max_startup_ms:.0f} ms)")
+            failed = True
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+import threading
+import time
+
+
+class CircuitOpenError(Exception):
+    """
+    Raised instead of calling the upstream API while its circuit is open.
+    """
+
+
+class CircuitBreaker:
+    """
+    Fail fast after sustained upstream errors.
+
+    After ``failure_threshold`` consecutive failures the circuit opens and calls are rejected immediately for
+    ``reset_timeout`` seconds. A single trial call is then let through: success closes the circuit again,
+    failure re-opens it.
+    """
+
+    def __init__(self, name, failure_threshold=5, reset_timeout=30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def _before_call(self):
+        with self._lock:
+            state = self.state
+            if state == "open" or (state == "half-open" and self._trial_running):
+                raise CircuitOpenError(f"Circuit '{self.name}' is open")
+            if state == "half-open":
+                self._trial_running = True
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._trial_running or self.failures >= self.failure_threshold:
+                if self.opened_at is None or self._trial_running:
+                    print(f"Circuit '{self.name}' opened after {self.failures} consecutive failures.")
+                self.opened_at = time.monotonic()
+            self._trial_running = False
+
+    def release_trial(self):
+        """
+        Free the half-open trial slot without changing the failure count.
+        """
+        with self._lock:
+            self._trial_running = False
+
+    def call(self, func, *args, is_failure=None, ignore=(), **kwargs):
+        """
+        Call ``func`` through the breaker.
+
+        :param is_failure: Optional predicate on the result; results it flags count as failures but are still
+                           returned to the caller. Exceptions raised by ``func`` count as failures too.
+        :param ignore: Exception types that say nothing about upstream health (e.g. no local API key free).
+                       They are re-raised without counting as a failure or a success.
+        """
+        self._before_call()
+        try:
+            result = func(*args, **kwargs)
+        except ignore:
+            self.release_trial()
+            raise
+        except Exception:
+            self.record_failure()
+            raise
+
+        if is_failure is not None and is_failure(result):
+            self.record_failure()
+        else:
+            self.record_success()
+        return result
@@ -2,8 +2,9 @@ import asyncio
 import aiohttp
 import json
 
-# Replace with your actual Companies House API key
-API_KEY = "03ed5851-da50-4a59-9c87-d903055fd3e6"
+from api_key_pool import key_pool
+from crawl_planner import SEARCH_RESULT_CAP, crawl_companies_by_name
+
 BASE_URL = "https://api.company-information.service.gov.uk"
 
 
@@ -28,7 +29,9 @@ async def search_companies_by_name(session, company_name, items_per_page=50):
         }
 
         # Fetch the search results with a GET request
-        async with session.get(url, params=params, auth=aiohttp.BasicAuth(API_KEY, "")) as response:
+        api_key = await key_pool.acquire_async()
+        async with session.get(url, params=params, auth=aiohttp.BasicAuth(api_key, "")) as response:
+            key_pool.record(api_key, response.status, response.headers)
             if response.status == 200:
                 result = await response.json()
                 companies = result.get("items", [])
@@ -40,10 +43,17 @@ async def search_companies_by_name(session, company_name, items_per_page=50):
 
                 # Otherwise, move to the next page.
                 start_index += items_per_page
+                if start_index >= SEARCH_RESULT_CAP:
+                    break
             else:
                 print(f"Failed to search companies by name. HTTP Status Code: {response.status}")
                 break
 
+    if start_index >= SEARCH_RESULT_CAP:
+        print(f"Search results reached the {SEARCH_RESULT_CAP} result cap; crawling the rest by partition.")
+        known_numbers = [company["company_number"] for company in all_companies]
+        all_companies.extend(await asyncio.to_thread(crawl_companies_by_name, company_name, known_numbers))
+
     return all_companies
 
 
@@ -56,7 +66,9 @@ async def extract_company_details(session, company_number):
     :return: Detailed company information.
     """
     url = f"{BASE_URL}/company/{company_number}"
-    async with session.get(url, auth=aiohttp.BasicAuth(API_KEY, "")) as response:
+    api_key = await key_pool.acquire_async()
+    async with session.get(url, auth=aiohttp.BasicAuth(api_key, "")) as response:
+        key_pool.record(api_key, response.status, response.headers)
         if response.status == 200:
             return await response.json()
         else:
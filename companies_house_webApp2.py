@@ -1,39 +1,186 @@
-from flask import Flask, jsonify, request, send_file
+from flask import Flask, Response, jsonify, request, send_from_directory, stream_with_context
+from collections import OrderedDict
+from datetime import datetime, timezone
+import json
+import threading
+
 import requests
-import csv
-import io
+
+from api_key_pool import KeyPoolExhausted, key_pool
+from circuit_breaker import CircuitBreaker, CircuitOpenError
+import compression
+from crawl_planner import (ADVANCED_SEARCH_PAGE_SIZE, ADVANCED_SEARCH_RESULT_CAP, SEARCH_RESULT_CAP, CrawlPlanner,
+                           search_item_from_advanced)
+from exporters import ExporterUnavailable, get_exporter
+from name_index import name_index
+from postcode_index import geocode, index_company, spatial_index
+import request_profiler
+from search_filters import advanced_search_params, matches, parse_filters
 
 app = Flask(__name__)
+compression.init_app(app)
+request_profiler.init_app(app)
 
-API_KEY = "03ed5851-da50-4a59-9c87-d903055fd3e6"
 BASE_URL = "https://api.company-information.service.gov.uk"
 
+# (connect, read) timeouts in seconds for each upstream endpoint.
+ENDPOINT_TIMEOUTS = {
+    "search": (3.05, 10),
+    "advanced_search": (3.05, 20),
+    "profile": (3.05, 5),
+}
+
+# Longest a request waits for an API key's rate-limit window to reset before falling back to stale data.
+KEY_WAIT_LIMIT = 1.0
+
+breakers = {endpoint: CircuitBreaker(endpoint) for endpoint in ENDPOINT_TIMEOUTS}
+
+# Last good response for each upstream request, served with a staleness marker while the API is failing.
+LAST_GOOD_CACHE_SIZE = 5000
+last_good_responses = OrderedDict()
+last_good_lock = threading.Lock()
+
+# Section of the formatted payload that each field lives in (None for top-level fields).
+PAYLOAD_FIELDS = {
+    "companyName": "companyInfo",
+    "companyNumber": "companyInfo",
+    "RegisteredOfficeAddress": "companyDetails",
+    "RegisteredOfficeAddressParts": "companyDetails",
+    "CompanyType": "companyDetails",
+    "CompanyStatus": "companyDetails",
+    "IncorporatedDate": "companyDetails",
+    "AccountsNextStatementDate": "accounts",
+    "AccountsDueDate": "accounts",
+    "AccountsLastStatementDate": "accounts",
+    "ConfirmationNextStatementDate": "confirmationStatement",
+    "ConfirmationDueDate": "confirmationStatement",
+    "ConfirmationLastStatementDate": "confirmationStatement",
+    "siCode": "natureOfBusiness",
+    "Description": "natureOfBusiness",
+    "previousCompanyNames": None,
+}
+
+SEARCH_PAGE_SIZE = 50
+
+# Payload fields that the search items already carry, mapped to the search item key they come from.
+SEARCH_ITEM_FIELDS = {
+    "companyName": "title",
+    "companyNumber": "company_number",
+    "RegisteredOfficeAddress": "address",
+    "RegisteredOfficeAddressParts": "address",
+    "CompanyType": "company_type",
+    "CompanyStatus": "company_status",
+    "IncorporatedDate": "date_of_creation",
+}
+
+# Fields returned by mode=summary: everything the results table needs without a profile fetch.
+SUMMARY_FIELDS = list(SEARCH_ITEM_FIELDS)
+
+
+class UpstreamUnavailable(Exception):
+    """
+    Raised when the first page of a search could be served neither by the API nor from the last-good cache.
+    """
+
+
+def is_upstream_failure(response):
+    return response.status_code >= 500 or response.status_code == 429
+
+
+def call_api(endpoint, url, params=None):
+    """
+    GET an API resource with the endpoint's timeout and circuit breaker.
+
+    When the API times out, errors, its circuit is open or no API key is available within KEY_WAIT_LIMIT, the
+    last good response to the same request is served instead, with ``_cachedAt`` set on it and on each of its items.
+
+    :return: Tuple of (HTTP status code, JSON data). The status is None when nothing could be served.
+    """
+    cache_key = (url, tuple(sorted((params or {}).items())))
+
+    try:
+        response = breakers[endpoint].call(key_pool.get, url, params=params, timeout=ENDPOINT_TIMEOUTS[endpoint],
+                                           max_wait=KEY_WAIT_LIMIT, is_failure=is_upstream_failure,
+                                           ignore=(KeyPoolExhausted,))
+        if response.status_code == 200:
+            data = response.json()
+            with last_good_lock:
+                last_good_responses[cache_key] = (data, datetime.now(timezone.utc).isoformat(timespec="seconds"))
+                last_good_responses.move_to_end(cache_key)
+                if len(last_good_responses) > LAST_GOOD_CACHE_SIZE:
+                    last_good_responses.popitem(last=False)
+            return 200, data
+        if not is_upstream_failure(response):
+            return response.status_code, None
+        print(f"Upstream {endpoint} request failed. HTTP Status Code: {response.status_code}")
+    except (CircuitOpenError, KeyPoolExhausted, requests.RequestException) as error:
+        print(f"Upstream {endpoint} request failed: {error}")
+
+    with last_good_lock:
+        cached = last_good_responses.get(cache_key)
+    if cached is None:
+        return None, None
+
+    data, cached_at = cached
+    stale = dict(data, _cachedAt=cached_at)
+    if "items" in data:
+        stale["items"] = [dict(item, _cachedAt=cached_at) for item in data["items"]]
+    return 200, stale
+
 
 def fetch_companies_by_search(query, search_type="company_name", start_index=0):
     """
     Fetch companies by search query (company name, company number, or SIC code) with pagination.
     """
-    search_url = f"{BASE_URL}/search/companies?q={query}&start={start_index}&items_per_page=50"
-    response = requests.get(search_url, auth=(API_KEY, ""))
+    search_url = f"{BASE_URL}/search/companies"
+    params = {"q": query, "start_index": start_index, "items_per_page": SEARCH_PAGE_SIZE}
+    status_code, data = call_api("search", search_url, params)
+
+    if status_code == 200:
+        return data
+    else:
+        print(f"Failed to fetch companies. HTTP Status Code: {status_code}")
+        return None
+
+
+def fetch_companies_by_advanced_search(query, filters, start_index=0, size=ADVANCED_SEARCH_PAGE_SIZE):
+    """
+    Fetch companies from the advanced search API with the supported filters pushed down.
 
-    if response.status_code == 200:
-        return response.json()
+    Items are returned in the same shape as the plain search API so they can be handled identically.
+    """
+    params = {"start_index": start_index, "size": size}
+    if query:
+        params["company_name_includes"] = query
+    params.update(advanced_search_params(filters))
+    status_code, data = call_api("advanced_search", f"{BASE_URL}/advanced-search/companies", params)
+
+    if status_code == 200:
+        data = dict(data)
+        data["items"] = [search_item_from_advanced(item) for item in data.get("items", [])]
+        return data
+    elif status_code == 404:
+        return {"items": []}  # Advanced search answers 404 when nothing matches.
     else:
-        print(f"Failed to fetch companies. HTTP Status Code: {response.status_code}")
+        print(f"Failed to fetch companies by advanced search. HTTP Status Code: {status_code}")
         return None
 
 
-def fetch_company_data(company_number):
+def fetch_company_data(company_number, report=None):
     """
     Fetch company details by company number from Companies House API.
+
+    :param report: Optional search report, marked incomplete if the profile could not be served at all.
     """
     url = f"{BASE_URL}/company/{company_number}"
-    response = requests.get(url, auth=(API_KEY, ""))
+    status_code, data = call_api("profile", url)
 
-    if response.status_code == 200:
-        return response.json()
+    if status_code == 200:
+        return data
     else:
-        print(f"Failed to fetch company details. HTTP Status Code: {response.status_code}")
+        if status_code is None and report is not None:
+            report['complete'] = False
+        print(f"Failed to fetch company details. HTTP Status Code: {status_code}")
         return None
 
 
@@ -54,6 +201,15 @@ def format_payload(company_data):
                 company_data.get("registered_office_address", {}).get("region"),
                 company_data.get("registered_office_address", {}).get("postal_code")
             ])),
+            "RegisteredOfficeAddressParts": {
+                "premises": company_data.get("registered_office_address", {}).get("premises"),
+                "addressLine1": company_data.get("registered_office_address", {}).get("address_line_1"),
+                "addressLine2": company_data.get("registered_office_address", {}).get("address_line_2"),
+                "locality": company_data.get("registered_office_address", {}).get("locality"),
+                "region": company_data.get("registered_office_address", {}).get("region"),
+                "postalCode": company_data.get("registered_office_address", {}).get("postal_code"),
+                "country": company_data.get("registered_office_address", {}).get("country"),
+            },
             "CompanyType": company_data.get("type", "N/A"),
             "CompanyStatus": company_data.get("company_status", "N/A"),
             "IncorporatedDate": company_data.get("date_of_creation", "N/A"),
@@ -71,7 +227,7 @@ def format_payload(company_data):
                                                                                                 "N/A"),
         },
         "natureOfBusiness": {
-            "siCode": ", ".join(company_data.get("sic_codes", [])),
+            "siCode": ", ".join(company_data.get("sic_codes") or []),
             "Description": "N/A"  # Replace with actual descriptions if available or map SIC codes to descriptions.
         },
         "previousCompanyNames": [
@@ -83,88 +239,390 @@ def format_payload(company_data):
             for name in company_data.get("previous_company_names", [])
         ],
     }
+    if company_data.get("_cachedAt"):
+        payload["dataStatus"] = {"stale": True, "cachedAt": company_data["_cachedAt"]}
     return payload
 
 
+def profile_from_search_item(item):
+    """
+    Map a search result item onto the keys of a company profile so it can go through format_payload.
+    """
+    return {
+        "company_name": item.get("title"),
+        "company_number": item.get("company_number"),
+        "registered_office_address": item.get("address") or {},
+        "type": item.get("company_type"),
+        "company_status": item.get("company_status"),
+        "date_of_creation": item.get("date_of_creation"),
+        "sic_codes": item.get("sic_codes"),
+        "_cachedAt": item.get("_cachedAt"),
+    }
+
+
+def resolve_fields(fields_arg, mode):
+    """
+    Work out which payload fields were requested.
+
+    :param fields_arg: Comma-separated field names from the ``fields`` query parameter, or None.
+    :param mode: ``summary`` for the search-only fields, anything else for the full payload.
+    :return: List of field names, or None for the full payload.
+    """
+    if fields_arg:
+        fields = [field.strip() for field in fields_arg.split(",") if field.strip()]
+        unknown = [field for field in fields if field not in PAYLOAD_FIELDS]
+        if unknown:
+            raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+        return fields
+    if mode == "summary":
+        return SUMMARY_FIELDS
+    return None
+
+
+def needs_profile(item, fields):
+    """
+    Decide whether a search item has to be enriched with the full company profile.
+    """
+    if fields is None:
+        return True
+    return any(field not in SEARCH_ITEM_FIELDS or not item.get(SEARCH_ITEM_FIELDS[field]) for field in fields)
+
+
+def project_payload(payload, fields):
+    """
+    Keep only the requested fields of a formatted payload, preserving its sections.
+    """
+    if fields is None:
+        return payload
+
+    projected = {}
+    for field in fields:
+        section = PAYLOAD_FIELDS[field]
+        if section is None:
+            projected[field] = payload.get(field)
+        else:
+            projected.setdefault(section, {})[field] = payload.get(section, {}).get(field)
+    if "dataStatus" in payload:
+        projected["dataStatus"] = payload["dataStatus"]  # Staleness is always reported
+    return projected
+
+
+def advanced_searchable(query, search_type):
+    """
+    Whether a query can be sent to the advanced search API, which matches company names and whole SIC codes only.
+    """
+    return search_type == 'company_name' or (search_type == 'sic_code' and len(query) == 5)
+
+
+def iter_search_items(query, search_type, filters, exhaustive=False, report=None):
+    """
+    Yield search items for a query, paging through the search or advanced search API.
+
+    :param exhaustive: Crawl past the search result cap by splitting the query into partitions.
+    :param report: Optional dict that receives completeness information once the generator is exhausted.
+    :raises UpstreamUnavailable: If the first page cannot be served from the API or the last-good cache. A
+        later page that fails ends the results early and marks the report incomplete.
+    """
+    report = report if report is not None else {}
+    use_advanced_search = bool(filters) and advanced_searchable(query, search_type)
+
+    if search_type == 'sic_code' and len(query) == 5:
+        filters = dict(filters, sic=query)  # Whole SIC codes can be pushed down to the advanced search API
+        query = None
+
+    if exhaustive:
+        planner = CrawlPlanner(
+            lambda page_filters, start_index, size: fetch_companies_by_advanced_search(
+                query, page_filters, start_index, size),
+            filters,
+        )
+        partitions = planner.plan()
+        if planner.report['expectedHits'] is None:
+            raise UpstreamUnavailable("The Companies House API is unavailable; please try again shortly.")
+        yield from planner.crawl(partitions)
+        report.update(planner.report)
+        return
+
+    page_size = ADVANCED_SEARCH_PAGE_SIZE if use_advanced_search else SEARCH_PAGE_SIZE
+    start_index = 0
+    report['complete'] = True
+
+    while True:
+        if use_advanced_search:
+            data = fetch_companies_by_advanced_search(query, filters, start_index, page_size)
+        else:
+            data = fetch_companies_by_search(query, search_type, start_index)
+
+        if data is None:
+            if start_index == 0:
+                raise UpstreamUnavailable("The Companies House API is unavailable; please try again shortly.")
+            report['complete'] = False
+            break
+        if not data.get('items'):
+            break
+
+        companies = data.get('items')
+        yield from companies
+
+        if len(companies) < page_size:
+            break  # No more pages to fetch
+        start_index += page_size  # Move to the next page of results
+
+        cap = ADVANCED_SEARCH_RESULT_CAP if use_advanced_search else SEARCH_RESULT_CAP
+        if start_index >= cap:
+            print(f"Search for '{query}' reached the {cap} result cap; use exhaustive=1 for the full result set.")
+            report['complete'] = False
+            break
+
+
+def iter_search_payloads(query, search_type, filters, fields, exhaustive=False, report=None):
+    """
+    Yield formatted (and projected) payloads for the companies matching a search.
+
+    Profiles are only fetched for rows that pass the filters and need fields the search items do not carry.
+    """
+    if search_type == 'sic_code' and 'sic' not in filters:
+        # The plain search API has no SIC filter, so SIC prefixes are checked against each result locally
+        filters = dict(filters, sic=query)
+
+    for company in iter_search_items(query, search_type, filters, exhaustive, report):
+        company_data = profile_from_search_item(company)
+        verdict = matches(company_data, filters)
+        if verdict is False:
+            continue  # Filtered out before paying for a profile fetch
+
+        from_profile = verdict is None or needs_profile(company, fields)
+        if from_profile:
+            company_data = fetch_company_data(company['company_number'], report)
+            if company_data and matches(company_data, filters) is not True:
+                continue
+
+        if company_data:
+            if not company_data.get("_cachedAt"):
+                index_company(company_data, complete=from_profile)
+                if from_profile:
+                    name_index.add_company(company_data)
+            formatted_data = format_payload(company_data)
+            yield project_payload(formatted_data, fields)
+
+
+def iter_json_array(items):
+    """
+    Serialise a list as a JSON array one element at a time, so the body is never built as one string.
+    """
+    yield "["
+    for index, item in enumerate(items):
+        yield ("," if index else "") + json.dumps(item)
+    yield "]"
+
+
+def search_near(postcode, radius_km, filters, fields):
+    """
+    Answer a "companies near here" query from the local postcode index.
+    """
+    try:
+        radius_km = float(radius_km)
+    except ValueError:
+        return jsonify({"error": "radius_km must be a number"}), 400
+
+    location = geocode(postcode)
+    if location is None:
+        return jsonify({"error": f"Unknown postcode: {postcode}"}), 400
+
+    all_companies = []
+    for distance, company_data in spatial_index.query(location[0], location[1], radius_km):
+        if matches(company_data, filters) is False:
+            continue
+        formatted_data = project_payload(format_payload(company_data), fields)
+        formatted_data["distanceKm"] = round(distance, 3)
+        all_companies.append(formatted_data)
+
+    return jsonify(all_companies)
+
+
+@app.route('/', methods=['GET'])
+def index():
+    """
+    Serve the search page, so its /search and /export requests go to this app.
+    """
+    return send_from_directory(app.root_path, "Frnotend.html")
+
+
 @app.route('/search', methods=['GET'])
 def search_companies():
     """
     Endpoint to search for companies based on company name, number, or SIC code.
+
+    Optional ``fields`` (comma-separated payload field names) or ``mode=summary`` restrict the response to
+    those fields. Company profiles are then only fetched for rows whose fields are not covered by the
+    search results themselves.
+
+    ``exhaustive=1`` crawls past the search result cap; the X-Results-Complete header reports whether the
+    full result set was returned. It is supported for company names and whole five digit SIC codes.
+
+    Optional filters (``status``, ``type``, ``incorporated_from``, ``incorporated_to``, ``sic`` prefix and
+    ``postcode_area``) are pushed down to the advanced search API where it supports them, and otherwise
+    applied to the search results before any profile is fetched.
+
+    ``format=ndjson`` streams one JSON object per line as results are produced. Responses are compressed
+    when the client accepts it.
+
+    ``near=<postcode>&radius_km=<km>`` answers from the companies already seen by this app, nearest first,
+    without calling the API.
     """
     query = request.args.get('query')
     search_type = request.args.get('search_type', 'company_name')
 
+    try:
+        fields = resolve_fields(request.args.get('fields'), request.args.get('mode', 'full'))
+        filters = parse_filters(request.args)
+    except ValueError as error:
+        return jsonify({"error": str(error)}), 400
+
+    if request.args.get('near'):
+        return search_near(request.args.get('near'), request.args.get('radius_km', '5'), filters, fields)
+
     if not query:
         return jsonify({"error": "Search query is required"}), 400
 
-    all_companies = []
-    start_index = 0
+    exhaustive = request.args.get('exhaustive') == '1'
+    if exhaustive and not advanced_searchable(query, search_type):
+        return jsonify({"error": "exhaustive=1 supports company_name and five digit sic_code searches only"}), 400
 
-    while True:
-        data = fetch_companies_by_search(query, search_type, start_index)
-
-        if data and data.get('items'):
-            companies = data.get('items')
-            for company in companies:
-                company_data = fetch_company_data(company['company_number'])
-                if company_data:
-                    formatted_data = format_payload(company_data)
-                    all_companies.append(formatted_data)
-
-            if len(companies) < 50:
-                break  # No more pages to fetch
-            else:
-                start_index += 50  # Move to the next page of results
-        else:
-            break
+    report = {}
+    payloads = iter_search_payloads(query, search_type, filters, fields, exhaustive, report)
 
-    return jsonify(all_companies)
+    if request.args.get('format') == 'ndjson':
+        # The first row is fetched before the headers go out, so an outage can still be answered with a 503.
+        try:
+            first = next(payloads, None)
+        except UpstreamUnavailable as error:
+            return jsonify({"error": str(error)}), 503
+
+        # Rows are sent as soon as they are ready; the last line reports whether the result set is complete.
+        def generate():
+            if first is not None:
+                yield json.dumps(first) + "\n"
+            for payload in payloads:
+                yield json.dumps(payload) + "\n"
+            yield json.dumps({"_meta": {"complete": report.get('complete', True),
+                                        "expectedHits": report.get('expectedHits')}}) + "\n"
+
+        return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
+
+    try:
+        all_companies = list(payloads)
+    except UpstreamUnavailable as error:
+        return jsonify({"error": str(error)}), 503
+    response = Response(iter_json_array(all_companies), mimetype="application/json")
+    response.headers['X-Results-Complete'] = str(report.get('complete', True)).lower()
+    if report.get('expectedHits') is not None:
+        response.headers['X-Results-Expected'] = str(report['expectedHits'])
+    return response
+
+
+@app.route('/names', methods=['GET'])
+def search_names():
+    """
+    Endpoint to find companies by current or previous name among the profiles fetched so far.
+
+    ``match`` is ``exact`` (default), ``prefix`` or ``fuzzy``; ``as_of`` (YYYY-MM-DD) restricts the results to
+    names in use on that date.
+    """
+    name = request.args.get('name')
+    if not name:
+        return jsonify({"error": "Name is required"}), 400
+
+    try:
+        results = name_index.lookup(name, request.args.get('match', 'exact'), request.args.get('as_of'),
+                                    int(request.args.get('limit', 50)))
+    except ValueError as error:
+        return jsonify({"error": str(error)}), 400
+
+    return jsonify(results)
 
 
-@app.route('/export', methods=['GET'])
+EXPORT_FIELDS = ["companyName", "companyNumber", "RegisteredOfficeAddress", "CompanyType", "CompanyStatus",
+                 "IncorporatedDate", "AccountsNextStatementDate", "AccountsDueDate", "AccountsLastStatementDate",
+                 "ConfirmationNextStatementDate", "ConfirmationDueDate", "ConfirmationLastStatementDate",
+                 "NatureOfBusiness", "PreviousCompanyNames"]
+
+
+# Payload sections that only come from the full company profile, and so are missing from mode=summary rows.
+PROFILE_SECTIONS = ("accounts", "confirmationStatement", "natureOfBusiness", "previousCompanyNames")
+
+
+def complete_payload(company):
+    """
+    Replace a summary payload with the full one, so every export column is filled.
+
+    The payload is returned as it is when it is already complete or its profile cannot be fetched.
+    """
+    number = company.get("companyInfo", {}).get("companyNumber")
+    if all(section in company for section in PROFILE_SECTIONS) or not number:
+        return company
+    company_data = fetch_company_data(number)
+    return format_payload(company_data) if company_data else company
+
+
+def export_row(company):
+    """
+    Flatten a formatted company payload into one CSV row.
+    """
+    return {
+        "companyName": company.get("companyInfo", {}).get("companyName"),
+        "companyNumber": company.get("companyInfo", {}).get("companyNumber"),
+        "RegisteredOfficeAddress": company.get("companyDetails", {}).get("RegisteredOfficeAddress"),
+        "CompanyType": company.get("companyDetails", {}).get("CompanyType"),
+        "CompanyStatus": company.get("companyDetails", {}).get("CompanyStatus"),
+        "IncorporatedDate": company.get("companyDetails", {}).get("IncorporatedDate"),
+        "AccountsNextStatementDate": company.get("accounts", {}).get("AccountsNextStatementDate"),
+        "AccountsDueDate": company.get("accounts", {}).get("AccountsDueDate"),
+        "AccountsLastStatementDate": company.get("accounts", {}).get("AccountsLastStatementDate"),
+        "ConfirmationNextStatementDate": company.get("confirmationStatement", {}).get(
+            "ConfirmationNextStatementDate"),
+        "ConfirmationDueDate": company.get("confirmationStatement", {}).get("ConfirmationDueDate"),
+        "ConfirmationLastStatementDate": company.get("confirmationStatement", {}).get(
+            "ConfirmationLastStatementDate"),
+        "NatureOfBusiness": company.get("natureOfBusiness", {}).get("Description"),
+        "PreviousCompanyNames": ", ".join([name['name'] for name in company.get("previousCompanyNames", [])])
+    }
+
+
+@app.route('/export', methods=['GET', 'POST'])
 def export_to_csv():
     """
-    Endpoint to export company data to CSV.
+    Endpoint to export company data to CSV (or another format given by ``file_type``).
+
+    Company payloads are posted as a JSON list, or passed as JSON strings in repeated ``companies_data``
+    query parameters. Summary payloads (``mode=summary`` search results) are completed from the company
+    profile before they are written.
     """
-    companies_data = request.args.getlist('companies_data')  # Expecting a list of company data in query params
+    if request.method == 'POST':
+        companies_data = request.get_json(silent=True) or []
+    else:
+        try:
+            companies_data = [json.loads(company) for company in request.args.getlist('companies_data')]
+        except ValueError:
+            return jsonify({"error": "companies_data must be JSON"}), 400
 
+    if not isinstance(companies_data, list) or not all(isinstance(company, dict) for company in companies_data):
+        return jsonify({"error": "companies_data must be a list of company objects"}), 400
     if not companies_data:
         return jsonify({"error": "No company data to export"}), 400
 
-    # Create a CSV in memory
-    output = io.StringIO()
-    writer = csv.DictWriter(output, fieldnames=["companyName", "companyNumber", "RegisteredOfficeAddress",
-                                                "CompanyType", "CompanyStatus", "IncorporatedDate",
-                                                "AccountsNextStatementDate", "AccountsDueDate",
-                                                "AccountsLastStatementDate", "ConfirmationNextStatementDate",
-                                                "ConfirmationDueDate", "ConfirmationLastStatementDate",
-                                                "NatureOfBusiness", "PreviousCompanyNames"])
-    writer.writeheader()
-
-    # Write data
-    for company in companies_data:
-        writer.writerow({
-            "companyName": company.get("companyInfo", {}).get("companyName"),
-            "companyNumber": company.get("companyInfo", {}).get("companyNumber"),
-            "RegisteredOfficeAddress": company.get("companyDetails", {}).get("RegisteredOfficeAddress"),
-            "CompanyType": company.get("companyDetails", {}).get("CompanyType"),
-            "CompanyStatus": company.get("companyDetails", {}).get("CompanyStatus"),
-            "IncorporatedDate": company.get("companyDetails", {}).get("IncorporatedDate"),
-            "AccountsNextStatementDate": company.get("accounts", {}).get("AccountsNextStatementDate"),
-            "AccountsDueDate": company.get("accounts", {}).get("AccountsDueDate"),
-            "AccountsLastStatementDate": company.get("accounts", {}).get("AccountsLastStatementDate"),
-            "ConfirmationNextStatementDate": company.get("confirmationStatement", {}).get(
-                "ConfirmationNextStatementDate"),
-            "ConfirmationDueDate": company.get("confirmationStatement", {}).get("ConfirmationDueDate"),
-            "ConfirmationLastStatementDate": company.get("confirmationStatement", {}).get(
-                "ConfirmationLastStatementDate"),
-            "NatureOfBusiness": company.get("natureOfBusiness", {}).get("Description"),
-            "PreviousCompanyNames": ", ".join([name['name'] for name in company.get("previousCompanyNames", [])])
-        })
-
-    output.seek(0)
-
-    return send_file(output, mimetype="text/csv", as_attachment=True, download_name="companies_data.csv")
+    try:
+        exporter = get_exporter(request.args.get('file_type', 'csv'))
+        exporter.writer  # Load the backend now, so a missing dependency is reported before the download starts
+    except ValueError as error:
+        return jsonify({"error": str(error)}), 400
+    except ExporterUnavailable as error:
+        return jsonify({"error": str(error)}), 501
+
+    rows = (export_row(complete_payload(company)) for company in companies_data)
+    response = Response(exporter.export(rows, EXPORT_FIELDS), mimetype=exporter.mimetype)
+    response.headers["Content-Disposition"] = f"attachment; filename=companies_data.{exporter.extension}"
+    return response
 
 
 if __name__ == "__main__":
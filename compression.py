@@ -0,0 +1,195 @@
+import os
+import zlib
+
+from flask import request
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Responses with these content types are compressed; everything else is passed through untouched.
+COMPRESSIBLE_TYPES = {"application/json", "application/x-ndjson", "text/csv"}
+
+# Bodies smaller than this are not worth compressing.
+MIN_SIZE = int(os.environ.get("COMPRESSION_MIN_SIZE", 1024))
+
+# Compression levels per encoding. Lower levels trade ratio for CPU time.
+LEVELS = {
+    "zstd": int(os.environ.get("COMPRESSION_LEVEL_ZSTD", 3)),
+    "br": int(os.environ.get("COMPRESSION_LEVEL_BR", 5)),
+    "gzip": int(os.environ.get("COMPRESSION_LEVEL_GZIP", 6)),
+}
+
+# Compressed output is flushed in blocks of this size, which keeps the compression ratio close to one-shot.
+FLUSH_BYTES = 64 * 1024
+
+# Content types whose rows must reach the client as soon as they are produced. These are sync-flushed after
+# every chunk and are not read ahead to check MIN_SIZE, since either would hold back rows already produced.
+LIVE_TYPES = {"application/x-ndjson"}
+
+
+def available_encodings():
+    """
+    Supported encodings in order of preference. brotli and zstd are used only when their packages are installed.
+    """
+    encodings = []
+    if zstandard is not None:
+        encodings.append("zstd")
+    if brotli is not None:
+        encodings.append("br")
+    encodings.append("gzip")
+    return encodings
+
+
+def negotiate_encoding(accept_encoding):
+    """
+    Pick the best supported encoding from an Accept-Encoding header, or None for no compression.
+    """
+    weights = {}
+    for part in (accept_encoding or "").split(","):
+        name, _, params = part.strip().partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        weight = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                weight = float(params[2:])
+            except ValueError:
+                weight = 0.0
+        weights[name] = weight
+
+    best = None
+    for encoding in available_encodings():
+        weight = weights.get(encoding, weights.get("*", 0.0))
+        if weight > 0 and (best is None or weight > best[1]):
+            best = (encoding, weight)
+    return best[0] if best else None
+
+
+class StreamCompressor:
+    """
+    Incremental compressor with a common interface for gzip, brotli and zstd.
+    """
+
+    def __init__(self, encoding, level=None):
+        level = LEVELS[encoding] if level is None else level
+        self.encoding = encoding
+        if encoding == "gzip":
+            self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+        elif encoding == "br":
+            self._compressor = brotli.Compressor(quality=level)
+        elif encoding == "zstd":
+            self._compressor = zstandard.ZstdCompressor(level=level).compressobj()
+        else:
+            raise ValueError(f"Unsupported encoding: {encoding}")
+
+    def compress(self, data):
+        if self.encoding == "br":
+            return self._compressor.process(data)
+        return self._compressor.compress(data)
+
+    def flush(self):
+        """
+        Emit everything compressed so far without ending the stream.
+        """
+        if self.encoding == "gzip":
+            return self._compressor.flush(zlib.Z_SYNC_FLUSH)
+        if self.encoding == "br":
+            return self._compressor.flush()
+        return self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self):
+        if self.encoding == "br":
+            return self._compressor.finish()
+        return self._compressor.flush()
+
+
+def compress_stream(chunks, compressor, source=None, flush_each=False):
+    """
+    Compress an iterable of byte chunks.
+
+    :param source: The original response iterable, closed when the stream finishes or is abandoned.
+    :param flush_each: Sync-flush after every chunk rather than every FLUSH_BYTES, for live streams whose next
+        chunk may be a long time coming.
+    """
+    try:
+        pending = 0
+        for chunk in chunks:
+            output = compressor.compress(chunk)
+            pending += len(chunk)
+            if pending and (flush_each or pending >= FLUSH_BYTES):
+                output += compressor.flush()
+                pending = 0
+            if output:
+                yield output
+        yield compressor.finish()
+    finally:
+        if hasattr(source, "close"):
+            source.close()
+
+
+def compress_response(response, accept_encoding, level=None, min_size=MIN_SIZE):
+    """
+    Compress a response body in streaming fashion if the client accepts it and it is worth it.
+
+    The first ``min_size`` bytes are read up front to decide whether to compress at all, and the rest is
+    compressed in FLUSH_BYTES blocks as it is produced. LIVE_TYPES are always compressed and flushed chunk by
+    chunk instead.
+    """
+    if (response.status_code != 200 or "Content-Encoding" in response.headers
+            or response.mimetype not in COMPRESSIBLE_TYPES):
+        return response
+
+    response.vary.add("Accept-Encoding")
+    encoding = negotiate_encoding(accept_encoding)
+    if encoding is None:
+        return response
+
+    live = response.mimetype in LIVE_TYPES
+    source = response.response
+    chunks = response.iter_encoded()
+    head = []
+    if not live:
+        size = 0
+        for chunk in chunks:
+            head.append(chunk)
+            size += len(chunk)
+            if size >= min_size:
+                break
+        else:
+            # The whole body is below the threshold; send it as it is.
+            if hasattr(source, "close"):
+                source.close()
+            response.set_data(b"".join(head))
+            return response
+
+    def body():
+        yield from head
+        yield from chunks
+
+    response.response = compress_stream(body(), StreamCompressor(encoding, level), source, flush_each=live)
+    response.direct_passthrough = False
+    response.headers["Content-Encoding"] = encoding
+    response.headers.pop("Content-Length", None)
+    return response
+
+
+def init_app(app):
+    """
+    Register streaming response compression on a Flask app.
+    """
+    @app.after_request
+    def compress(response):
+        if request.method == "HEAD":
+            return response
+        return compress_response(response, request.headers.get("Accept-Encoding"))
+
+    return app
@@ -0,0 +1,108 @@
+import json
+import os
+import time
+
+
+class CrawlJournal:
+    """
+    Append-only checkpoint journal for long-running crawls.
+
+    Every completed search page, fetched company and failure is appended as one JSON line. Re-opening the same
+    journal replays it, so an interrupted crawl resumes where it stopped and only retries the failed items.
+    """
+
+    def __init__(self, path, writable=True):
+        self.path = path
+        self.pages = {}
+        self.companies = {}
+        self.failures = {}
+        self._handle = None
+        needs_newline = self._replay()
+        if writable:
+            self._handle = open(path, "a", encoding="utf-8")
+            if needs_newline:
+                self._handle.write("\n")  # Keep new entries off a partially written last line
+
+    @classmethod
+    def read(cls, path):
+        """
+        Replay a journal without opening it for writing, e.g. to use the profiles of a finished crawl.
+
+        :raises FileNotFoundError: If there is no journal at ``path``.
+        """
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"No crawl journal at {path}")
+        return cls(path, writable=False)
+
+    def _replay(self):
+        """
+        Load the state recorded so far. Returns True if the file does not end with a complete line.
+        """
+        if not os.path.exists(self.path):
+            return False
+
+        line = "\n"
+        with open(self.path, encoding="utf-8") as handle:
+            for line in handle:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # A crash can leave a partially written last line behind.
+
+                event = entry.get("event")
+                if event == "page":
+                    self.pages[entry["page"]] = entry["items"]
+                elif event == "company":
+                    self.companies[entry["company_number"]] = entry["data"]
+                    self.failures.pop(entry["company_number"], None)
+                elif event == "failed":
+                    self.failures[entry["company_number"]] = entry["reason"]
+
+        return not line.endswith("\n")
+
+    def _append(self, entry):
+        entry["at"] = time.time()
+        self._handle.write(json.dumps(entry) + "\n")
+        self._handle.flush()
+
+    def page_done(self, page, items):
+        """
+        Record a completed search page.
+
+        :param page: Key identifying the page, e.g. its start index.
+        :param items: Search items returned for the page.
+        """
+        page = str(page)
+        self.pages[page] = items
+        self._append({"event": "page", "page": page, "items": items})
+
+    def company_done(self, company_number, data):
+        self.companies[company_number] = data
+        self.failures.pop(company_number, None)
+        self._append({"event": "company", "company_number": company_number, "data": data})
+
+    def company_failed(self, company_number, reason):
+        self.failures[company_number] = reason
+        self._append({"event": "failed", "company_number": company_number, "reason": reason})
+
+    def page(self, page):
+        """
+        Items of an already completed page, or None if the page still has to be fetched.
+        """
+        return self.pages.get(str(page))
+
+    def pending(self, company_numbers):
+        """
+        Company numbers that still have to be fetched (never attempted or previously failed).
+        """
+        return [number for number in company_numbers if number not in self.companies]
+
+    def close(self):
+        if self._handle is not None:
+            self._handle.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
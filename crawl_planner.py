@@ -0,0 +1,283 @@
+import hashlib
+import math
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import date, timedelta
+
+from api_key_pool import key_pool
+from search_filters import advanced_search_params
+
+BASE_URL = "https://api.company-information.service.gov.uk"
+
+# The plain search API refuses to page past this many results; CrawlPlanner gets the rest.
+SEARCH_RESULT_CAP = 1000
+
+# The advanced search API will not page beyond this many results for a single query.
+ADVANCED_SEARCH_RESULT_CAP = 5000
+ADVANCED_SEARCH_PAGE_SIZE = 500
+
+EARLIEST_INCORPORATION = "1800-01-01"
+
+# Statuses used to split a single incorporation day that still holds more results than the cap.
+COMPANY_STATUSES = [
+    "active", "dissolved", "liquidation", "receivership", "administration", "voluntary-arrangement",
+    "converted-closed", "insolvency-proceedings", "registered", "removed", "closed", "open",
+]
+
+
+def search_item_from_advanced(item):
+    """
+    Reshape an advanced search item like a plain search item, so both can be handled identically.
+    """
+    return {
+        "title": item.get("company_name"),
+        "company_number": item.get("company_number"),
+        "company_status": item.get("company_status"),
+        "company_type": item.get("company_type"),
+        "date_of_creation": item.get("date_of_creation"),
+        "address": item.get("registered_office_address") or {},
+        "sic_codes": item.get("sic_codes"),
+        "_cachedAt": item.get("_cachedAt"),
+    }
+
+
+def fetch_advanced_search_page(company_name, filters, start_index=0, size=ADVANCED_SEARCH_PAGE_SIZE):
+    """
+    Fetch one page of advanced search results for a CrawlPlanner, with items in the plain search shape.
+    """
+    params = {"start_index": start_index, "size": size}
+    if company_name:
+        params["company_name_includes"] = company_name
+    params.update(advanced_search_params(filters))
+    response = key_pool.get(f"{BASE_URL}/advanced-search/companies", params=params)
+
+    if response.status_code == 404:
+        return {"hits": 0, "items": []}  # Advanced search answers 404 when nothing matches.
+    if response.status_code != 200:
+        print(f"Failed to fetch companies by advanced search. HTTP Status Code: {response.status_code}")
+        return None
+    data = response.json()
+    data["items"] = [search_item_from_advanced(item) for item in data.get("items", [])]
+    return data
+
+
+class BloomFilter:
+    """
+    Compact probabilistic set of company numbers.
+
+    Useful for very large crawls where an exact set would not fit in memory; a small fraction of genuinely new
+    companies (the false positive rate) may be reported as already seen.
+    """
+
+    def __init__(self, expected_items=1_000_000, false_positive_rate=0.001):
+        self.size = max(8, int(-expected_items * math.log(false_positive_rate) / math.log(2) ** 2))
+        self.hash_count = max(1, round(self.size / expected_items * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, value):
+        digest = hashlib.blake2b(value.encode("utf-8"), digest_size=16).digest()
+        first, second = int.from_bytes(digest[:8], "little"), int.from_bytes(digest[8:], "little")
+        return [(first + i * second) % self.size for i in range(self.hash_count)]
+
+    def add(self, value):
+        """
+        Add a value. Returns True if it was (probably) not present before.
+        """
+        added = False
+        for position in self._positions(value):
+            byte, bit = divmod(position, 8)
+            if not self.bits[byte] & (1 << bit):
+                self.bits[byte] |= 1 << bit
+                added = True
+        return added
+
+
+class ExactSet:
+    """
+    Exact set of company numbers with the same interface as BloomFilter.
+    """
+
+    def __init__(self):
+        self.values = set()
+
+    def add(self, value):
+        if value in self.values:
+            return False
+        self.values.add(value)
+        return True
+
+
+def split_date_window(date_from, date_to):
+    """
+    Split an inclusive YYYY-MM-DD window into two disjoint halves, or return None for a single day.
+    """
+    start, end = date.fromisoformat(date_from), date.fromisoformat(date_to)
+    if start >= end:
+        return None
+    middle = start + (end - start) // 2
+    return (date_from, middle.isoformat()), ((middle + timedelta(days=1)).isoformat(), date_to)
+
+
+class CrawlPlanner:
+    """
+    Crawl every result of an advanced search, even when there are more results than the API will page through.
+
+    The query is split into disjoint partitions (incorporation date windows, then company status) until each
+    partition fits under the result cap. Partitions are fetched in parallel and company numbers are deduplicated.
+
+    :param fetch_page: Callable ``(filters, start_index, size)`` returning the advanced search response
+                       (a dict with ``hits`` and ``items``) or None on failure.
+    :param filters: Base filters in the search_filters vocabulary (status, type, incorporated_from/to, sic...).
+    :param max_workers: Number of partitions fetched concurrently.
+    :param seen: Set used for deduplication; defaults to an exact set, pass a BloomFilter for huge crawls.
+    """
+
+    def __init__(self, fetch_page, filters=None, cap=ADVANCED_SEARCH_RESULT_CAP,
+                 page_size=ADVANCED_SEARCH_PAGE_SIZE, max_workers=8, seen=None):
+        self.fetch_page = fetch_page
+        self.filters = dict(filters or {})
+        self.cap = cap
+        self.page_size = page_size
+        self.max_workers = max_workers
+        self.seen = seen if seen is not None else ExactSet()
+        self.report = {
+            "partitions": 0,
+            "expectedHits": None,
+            "fetched": 0,
+            "unique": 0,
+            "duplicates": 0,
+            "truncatedPartitions": [],
+            "failedPartitions": [],
+            "failedPages": [],
+            "complete": False,
+        }
+
+    def count(self, filters):
+        """
+        Number of results for a partition, or None if the count request failed.
+        """
+        data = self.fetch_page(filters, 0, 1)
+        if data is None:
+            return None
+        return data.get("hits", len(data.get("items", [])))
+
+    def split(self, partition):
+        """
+        Split a partition into disjoint sub-partitions, or return None if it cannot be split any further.
+        """
+        filters = partition["filters"]
+        halves = split_date_window(filters.get("incorporated_from", EARLIEST_INCORPORATION),
+                                   filters.get("incorporated_to", date.today().isoformat()))
+        if halves:
+            return [
+                {"filters": dict(filters, incorporated_from=date_from, incorporated_to=date_to)}
+                for date_from, date_to in halves
+            ]
+
+        if len(filters.get("status", COMPANY_STATUSES)) > 1:
+            return [{"filters": dict(filters, status=[status])} for status in filters.get("status", COMPANY_STATUSES)]
+
+        return None
+
+    def plan(self):
+        """
+        Work out the partitions to crawl. Each returned partition has its ``filters`` and expected ``hits``.
+        """
+        pending = [{"filters": self.filters}]
+        leaves = []
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while pending:
+                counts = list(executor.map(lambda partition: self.count(partition["filters"]), pending))
+                next_level = []
+                for partition, hits in zip(pending, counts):
+                    partition["hits"] = hits
+                    if partition["filters"] is self.filters:
+                        self.report["expectedHits"] = hits
+                    if hits is None:
+                        print(f"Failed to count results for partition {partition['filters']}; skipping it.")
+                        self.report["failedPartitions"].append(partition["filters"])
+                        continue
+                    if hits == 0:
+                        continue
+                    if hits <= self.cap:
+                        leaves.append(partition)
+                        continue
+
+                    children = self.split(partition)
+                    if children:
+                        next_level.extend(children)
+                    else:
+                        partition["truncated"] = True
+                        leaves.append(partition)
+                        self.report["truncatedPartitions"].append(partition["filters"])
+                pending = next_level
+
+        self.report["partitions"] = len(leaves)
+        return leaves
+
+    def pages(self, partition):
+        """
+        Start indexes of the pages needed to read a partition, stopping at the cap.
+        """
+        return range(0, min(partition["hits"], self.cap), self.page_size)
+
+    def fetch_partition(self, partition):
+        items = []
+        for start_index in self.pages(partition):
+            data = self.fetch_page(partition["filters"], start_index, self.page_size)
+            if data is None:
+                self.report["failedPages"].append({"filters": partition["filters"], "startIndex": start_index})
+                continue
+            items.extend(data.get("items", []))
+        return items
+
+    def crawl(self, partitions=None):
+        """
+        Fetch every partition in parallel and yield each unique company item as its partition completes.
+        """
+        if partitions is None:
+            partitions = self.plan()
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = [executor.submit(self.fetch_partition, partition) for partition in partitions]
+            for future in as_completed(futures):
+                for item in future.result():
+                    self.report["fetched"] += 1
+                    if self.seen.add(item["company_number"]):
+                        self.report["unique"] += 1
+                        yield item
+                    else:
+                        self.report["duplicates"] += 1
+
+        # Compare against the root count rather than the sum of the partitions: companies without an
+        # incorporation date match the root query but fall outside every date window.
+        expected = self.report["expectedHits"]
+        self.report["complete"] = (
+            expected is not None and self.report["unique"] >= expected
+            and not self.report["truncatedPartitions"] and not self.report["failedPartitions"]
+            and not self.report["failedPages"]
+        )
+        if expected is not None and self.report["unique"] < expected:
+            print(f"Crawl found {self.report['unique']} of {expected} expected companies; "
+                  f"{expected - self.report['unique']} could not be reached through any partition.")
+
+
+def crawl_companies_by_name(company_name, known_numbers=(), filters=None, max_workers=8):
+    """
+    Find every company whose name includes ``company_name``, for scripts whose plain search hit SEARCH_RESULT_CAP.
+
+    :param known_numbers: Company numbers the caller already has; they are not returned again.
+    :return: List of search items not in ``known_numbers``.
+    """
+    planner = CrawlPlanner(
+        lambda page_filters, start_index, size: fetch_advanced_search_page(company_name, page_filters, start_index,
+                                                                            size),
+        filters, max_workers=max_workers,
+    )
+    known_numbers = set(known_numbers)
+
+    companies = [company for company in planner.crawl() if company["company_number"] not in known_numbers]
+    if not planner.report["complete"]:
+        print(f"Crawl for '{company_name}' is incomplete: {planner.report['unique']} companies found, "
+              f"{planner.report['expectedHits']} expected.")
+    return companies
@@ -0,0 +1,201 @@
+import csv
+import importlib
+import io
+import itertools
+import json
+
+# Rows are handed to the xlsx and parquet backends in batches of this size.
+BATCH_SIZE = 1000
+
+
+class ExporterUnavailable(Exception):
+    """
+    Raised when an export format's optional dependency is not installed.
+    """
+
+
+class Exporter:
+    """
+    A registered export format.
+
+    The backend is given as ``"module:function"`` and is only imported the first time the format is used, so
+    heavy libraries such as openpyxl or pyarrow never load in workers that do not export. Resolve ``writer``
+    before sending any response headers: that is when a missing dependency in ``requires`` is reported.
+    """
+
+    def __init__(self, name, mimetype, extension, backend, requires=()):
+        self.name = name
+        self.mimetype = mimetype
+        self.extension = extension
+        self.backend = backend
+        self.requires = requires
+        self._writer = None
+
+    @property
+    def writer(self):
+        if self._writer is None:
+            try:
+                for module_name in self.requires:
+                    importlib.import_module(module_name)
+            except ImportError as error:
+                raise ExporterUnavailable(f"{self.name} export needs {error.name}, which is not installed") from error
+            module_name, _, function_name = self.backend.partition(":")
+            self._writer = getattr(importlib.import_module(module_name), function_name)
+        return self._writer
+
+    def export(self, rows, fieldnames=None):
+        """
+        Stream rows (dicts) in this format.
+
+        :param rows: Any iterable of dicts; it is consumed lazily.
+        :param fieldnames: Column order; taken from the first row when omitted.
+        :return: Iterator of bytes chunks.
+        """
+        rows = iter(rows)
+        if fieldnames is None:
+            first = next(rows, None)
+            if first is None:
+                fieldnames = []
+            else:
+                fieldnames = list(first)
+                rows = itertools.chain([first], rows)
+
+        for chunk in self.writer(rows, fieldnames):
+            yield chunk.encode("utf-8") if isinstance(chunk, str) else chunk
+
+
+EXPORTERS = {}
+
+
+def register_exporter(name, mimetype, extension, backend, aliases=(), requires=()):
+    """
+    Register an export format under ``name`` (and any ``aliases``).
+
+    :param requires: Optional modules the backend imports; checked when the format is first used.
+    """
+    exporter = Exporter(name, mimetype, extension, backend, requires)
+    for key in (name, *aliases):
+        EXPORTERS[key] = exporter
+    return exporter
+
+
+def get_exporter(name):
+    try:
+        return EXPORTERS[name]
+    except KeyError:
+        raise ValueError(f"Unknown export format: {name}. Choose one of {', '.join(sorted(EXPORTERS))}") from None
+
+
+def write_csv(rows, fieldnames):
+    output = io.StringIO()
+    writer = csv.DictWriter(output, fieldnames=fieldnames, extrasaction="ignore")
+    writer.writeheader()
+
+    for row in rows:
+        writer.writerow(row)
+        yield output.getvalue()
+        output.seek(0)
+        output.truncate()
+
+    yield output.getvalue()
+
+
+def write_json(rows, fieldnames):
+    yield "["
+    for index, row in enumerate(rows):
+        yield ("," if index else "") + json.dumps({field: row.get(field) for field in fieldnames})
+    yield "]"
+
+
+def write_ndjson(rows, fieldnames):
+    for row in rows:
+        yield json.dumps({field: row.get(field) for field in fieldnames}) + "\n"
+
+
+def cell_value(value):
+    """
+    Spreadsheet and columnar formats only take scalars; anything nested is written as JSON.
+    """
+    if isinstance(value, (dict, list)):
+        return json.dumps(value)
+    return value
+
+
+def write_xlsx(rows, fieldnames):
+    # An xlsx file is a zip archive that can only be emitted once complete, but the write-only workbook keeps
+    # memory flat while rows are added.
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    sheet.append(fieldnames)
+    for row in rows:
+        sheet.append([cell_value(row.get(field)) for field in fieldnames])
+
+    output = io.BytesIO()
+    workbook.save(output)
+    output.seek(0)
+    yield from iter(lambda: output.read(64 * 1024), b"")
+
+
+class _ChunkSink:
+    """
+    Write-only file object that hands over everything written since the last call to ``take``.
+    """
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data):
+        data = bytes(data)
+        self.chunks.append(data)
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def take(self):
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def write_parquet(rows, fieldnames):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([(field, pa.string()) for field in fieldnames])
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema)
+
+    while True:
+        batch = list(itertools.islice(rows, BATCH_SIZE))
+        if not batch:
+            break
+        columns = {
+            field: [None if row.get(field) is None else str(cell_value(row.get(field))) for row in batch]
+            for field in fieldnames
+        }
+        writer.write_table(pa.table(columns, schema=schema))
+        yield sink.take()
+
+    writer.close()
+    yield sink.take()
+
+
+register_exporter("csv", "text/csv", "csv", "exporters:write_csv")
+register_exporter("json", "application/json", "json", "exporters:write_json")
+register_exporter("ndjson", "application/x-ndjson", "ndjson", "exporters:write_ndjson")
+register_exporter("xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", "xlsx",
+                  "exporters:write_xlsx", aliases=("excel",), requires=("openpyxl",))
+register_exporter("parquet", "application/vnd.apache.parquet", "parquet", "exporters:write_parquet",
+                  requires=("pyarrow", "pyarrow.parquet"))
@@ -0,0 +1,211 @@
+import bisect
+import re
+import sys
+import threading
+from collections import OrderedDict
+from datetime import date
+
+from crawl_journal import CrawlJournal
+from search_filters import DATE_PATTERN
+
+# Equivalent company name suffixes are folded together so "ACME LIMITED" and "Acme Ltd." match exactly.
+SUFFIXES = [
+    (re.compile(r"\bPUBLIC LIMITED COMPANY$"), "PLC"),
+    (re.compile(r"\bLIMITED$"), "LTD"),
+    (re.compile(r"\bLIMITED LIABILITY PARTNERSHIP$"), "LLP"),
+]
+
+# Minimum trigram similarity for a fuzzy match.
+FUZZY_THRESHOLD = 0.4
+
+# Companies kept in the app's name index; the least recently added are dropped beyond this.
+NAME_INDEX_SIZE = 200000
+
+
+def normalise_name(name):
+    """
+    Upper-case a company name, drop punctuation and fold common suffixes.
+    """
+    name = re.sub(r"[^A-Z0-9& ]+", " ", (name or "").upper().replace("'", ""))
+    name = re.sub(r"\s+", " ", name).strip()
+    for pattern, replacement in SUFFIXES:
+        name = pattern.sub(replacement, name)
+    return name
+
+
+def trigrams(name):
+    padded = f"  {name} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def is_iso_date(value):
+    if not DATE_PATTERN.match(value):
+        return False
+    try:
+        date.fromisoformat(value)
+    except ValueError:
+        return False
+    return True
+
+
+class NameIndex:
+    """
+    In-memory index of current and previous company names.
+
+    Each name carries the period it was valid for, so lookups can be restricted to the names in use on a date.
+    Supports exact, prefix and fuzzy (trigram similarity) matching.
+
+    :param max_companies: Most companies to keep; adding one more drops the least recently added. None for no
+        limit.
+    """
+
+    def __init__(self, max_companies=NAME_INDEX_SIZE):
+        self.max_companies = max_companies
+        self._names = {}  # normalised name -> list of entries
+        self._companies = OrderedDict()  # company number -> entries of that company, least recently added first
+        self._trigrams = {}  # trigram -> set of normalised names
+        self._sorted = []
+        self._sorted_dirty = False
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._companies)
+
+    def _remove_company(self, company_number):
+        for entry in self._companies.pop(company_number, []):
+            entries = self._names.get(entry["normalised"], [])
+            entries.remove(entry)
+            if not entries:
+                del self._names[entry["normalised"]]
+                for trigram in trigrams(entry["normalised"]):
+                    self._trigrams[trigram].discard(entry["normalised"])
+                self._sorted_dirty = True
+
+    def add_company(self, company_data):
+        """
+        Index the current and previous names of a company profile, replacing anything indexed for it before.
+        """
+        company_number = company_data.get("company_number")
+        if not company_number or not company_data.get("company_name"):
+            return
+
+        previous_names = company_data.get("previous_company_names") or []
+        entries = [
+            {
+                "company_number": company_number,
+                "name": previous.get("name"),
+                "validFrom": previous.get("effective_from"),
+                "validTo": previous.get("ceased_on"),
+                "current": False,
+            }
+            for previous in previous_names if previous.get("name")
+        ]
+        entries.append({
+            "company_number": company_number,
+            "name": company_data["company_name"],
+            "validFrom": max((entry["validTo"] for entry in entries if entry["validTo"]),
+                             default=company_data.get("date_of_creation")),
+            "validTo": company_data.get("date_of_cessation"),
+            "current": True,
+        })
+
+        with self._lock:
+            self._remove_company(company_number)
+            for entry in entries:
+                entry["normalised"] = normalise_name(entry["name"])
+                if entry["normalised"] not in self._names:
+                    self._names[entry["normalised"]] = []
+                    for trigram in trigrams(entry["normalised"]):
+                        self._trigrams.setdefault(trigram, set()).add(entry["normalised"])
+                    self._sorted_dirty = True
+                self._names[entry["normalised"]].append(entry)
+            self._companies[company_number] = entries
+            while self.max_companies is not None and len(self._companies) > self.max_companies:
+                self._remove_company(next(iter(self._companies)))
+
+    def _candidates(self, name, match):
+        """
+        Normalised names matching a query, with their similarity score.
+        """
+        if match == "exact":
+            return [(name, 1.0)] if name in self._names else []
+
+        if match == "prefix":
+            if self._sorted_dirty:
+                self._sorted = sorted(self._names)
+                self._sorted_dirty = False
+            start = bisect.bisect_left(self._sorted, name)
+            end = bisect.bisect_left(self._sorted, name + "\uffff")
+            return [(candidate, 1.0) for candidate in self._sorted[start:end]]
+
+        if match == "fuzzy":
+            query = trigrams(name)
+            shared = {}
+            for trigram in query:
+                for candidate in self._trigrams.get(trigram, ()):
+                    shared[candidate] = shared.get(candidate, 0) + 1
+            scored = []
+            for candidate, count in shared.items():
+                score = count / (len(query) + len(trigrams(candidate)) - count)
+                if score >= FUZZY_THRESHOLD:
+                    scored.append((candidate, score))
+            return scored
+
+        raise ValueError(f"Unknown match type: {match}")
+
+    def lookup(self, name, match="exact", as_of=None, limit=50):
+        """
+        Find companies that use or used a name.
+
+        :param name: Name to look for.
+        :param match: ``exact``, ``prefix`` or ``fuzzy``.
+        :param as_of: Optional YYYY-MM-DD date; only names valid on that date are returned.
+        :param limit: Maximum number of results, best matches first.
+        :return: List of dicts with companyNumber, name, validFrom, validTo, current and score.
+        :raises ValueError: For an unknown match type or an ``as_of`` that is not a YYYY-MM-DD date.
+        """
+        if as_of and not is_iso_date(as_of):
+            raise ValueError("as_of must be a date in YYYY-MM-DD format")
+
+        with self._lock:
+            results = []
+            for candidate, score in self._candidates(normalise_name(name), match):
+                for entry in self._names[candidate]:
+                    if as_of and ((entry["validFrom"] and entry["validFrom"] > as_of)
+                                  or (entry["validTo"] and entry["validTo"] < as_of)):
+                        continue
+                    results.append({
+                        "companyNumber": entry["company_number"],
+                        "name": entry["name"],
+                        "validFrom": entry["validFrom"],
+                        "validTo": entry["validTo"],
+                        "current": entry["current"],
+                        "score": round(score, 3),
+                    })
+
+        results.sort(key=lambda result: (-result["score"], result["name"]))
+        return results[:limit]
+
+
+name_index = NameIndex()
+
+
+def ingest_journal(path, index=name_index):
+    """
+    Index every company profile recorded in a crawl journal.
+    """
+    for company_data in CrawlJournal.read(path).companies.values():
+        index.add_company(company_data)
+    return index
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 4:
+        print("Usage: python name_index.py <name> <exact|prefix|fuzzy> <crawl journal>...")
+        sys.exit(1)
+
+    journal_index = NameIndex(max_companies=None)  # The journals are read in full, however large they are
+    for journal_path in sys.argv[3:]:
+        ingest_journal(journal_path, journal_index)
+    for result in journal_index.lookup(sys.argv[1], sys.argv[2]):
+        print(result)
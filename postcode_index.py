@@ -0,0 +1,209 @@
+import csv
+import math
+import os
+import threading
+from collections import OrderedDict
+
+CENTROIDS_PATH = os.environ.get(
+    "POSTCODE_CENTROIDS_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "postcode_centroids.csv"))
+
+GEOHASH_ALPHABET = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+# Companies are bucketed at every geohash length up to this one (precision 6 cells are about 1.2km x 0.6km).
+INDEX_PRECISION = 6
+
+# Upper bound on the number of cells scanned by one query; the coarsest precision that stays under it is used.
+MAX_QUERY_CELLS = 36
+
+EARTH_RADIUS_KM = 6371.0
+
+# Companies kept in the spatial index; the least recently indexed are dropped beyond this.
+SPATIAL_INDEX_SIZE = 50000
+
+
+def normalise_postcode(postcode):
+    return (postcode or "").replace(" ", "").upper()
+
+
+def outward_code(postcode):
+    """
+    Outward code of a postcode ("SW1A 1AA" -> "SW1A"). Inputs that are already an outward code are returned as is.
+    """
+    postcode = normalise_postcode(postcode)
+    return postcode[:-3] if len(postcode) >= 5 else postcode
+
+
+def load_postcode_centroids(path=CENTROIDS_PATH):
+    """
+    Load postcode centroids from a CSV with postcode, latitude and longitude columns.
+
+    Rows may hold full postcodes or outward codes; lines starting with '#' are ignored.
+    """
+    centroids = {}
+    if not os.path.exists(path):
+        print(f"Postcode centroid file {path} not found; 'near' searches will not find any postcodes.")
+        return centroids
+
+    with open(path, newline="", encoding="utf-8") as handle:
+        reader = csv.DictReader(line for line in handle if not line.startswith("#"))
+        for row in reader:
+            centroids[normalise_postcode(row["postcode"])] = (float(row["latitude"]), float(row["longitude"]))
+    return centroids
+
+
+_centroids = None
+
+
+def geocode(postcode):
+    """
+    Look up the centroid of a postcode, falling back to its outward code.
+
+    :return: (latitude, longitude) or None if the postcode is unknown.
+    """
+    global _centroids
+    if _centroids is None:
+        _centroids = load_postcode_centroids()
+
+    postcode = normalise_postcode(postcode)
+    return _centroids.get(postcode) or _centroids.get(outward_code(postcode))
+
+
+def geohash_encode(latitude, longitude, precision=INDEX_PRECISION):
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    geohash, bits, bit_count, even = [], 0, 0, True
+
+    while len(geohash) < precision:
+        value, value_range = (longitude, lon_range) if even else (latitude, lat_range)
+        middle = (value_range[0] + value_range[1]) / 2
+        bits <<= 1
+        if value >= middle:
+            bits |= 1
+            value_range[0] = middle
+        else:
+            value_range[1] = middle
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            geohash.append(GEOHASH_ALPHABET[bits])
+            bits, bit_count = 0, 0
+
+    return "".join(geohash)
+
+
+def geohash_cell_size(precision):
+    """
+    Height and width of a geohash cell in degrees.
+    """
+    lon_bits = math.ceil(5 * precision / 2)
+    lat_bits = 5 * precision - lon_bits
+    return 180.0 / 2 ** lat_bits, 360.0 / 2 ** lon_bits
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+class SpatialIndex:
+    """
+    In-memory geohash index of companies by registered office location.
+
+    :param max_size: Most companies to keep; adding one more drops the least recently added. None for no limit.
+    """
+
+    def __init__(self, max_size=SPATIAL_INDEX_SIZE):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._cells = {precision: {} for precision in range(1, INDEX_PRECISION + 1)}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _unlink(self, company_number):
+        entry = self._entries.pop(company_number, None)
+        if entry:
+            for precision in self._cells:
+                cell = self._cells[precision].get(entry["geohash"][:precision])
+                if cell:
+                    cell.discard(company_number)
+
+    def add(self, company_number, latitude, longitude, record):
+        """
+        Add or move a company. ``record`` is stored as is and returned by queries.
+        """
+        geohash = geohash_encode(latitude, longitude)
+        with self._lock:
+            self._unlink(company_number)
+            self._entries[company_number] = {
+                "latitude": latitude, "longitude": longitude, "geohash": geohash, "record": record,
+            }
+            for precision in self._cells:
+                self._cells[precision].setdefault(geohash[:precision], set()).add(company_number)
+            while self.max_size is not None and len(self._entries) > self.max_size:
+                self._unlink(next(iter(self._entries)))
+
+    def get(self, company_number):
+        entry = self._entries.get(company_number)
+        return entry["record"] if entry else None
+
+    def query(self, latitude, longitude, radius_km):
+        """
+        Companies within ``radius_km`` of a point, nearest first.
+
+        :return: List of (distance in km, record) tuples.
+        """
+        lat_delta = radius_km / 111.0
+        lon_delta = radius_km / max(0.01, 111.0 * math.cos(math.radians(latitude)))
+        min_lat, max_lat = max(-90.0, latitude - lat_delta), min(90.0, latitude + lat_delta)
+        min_lon, max_lon = max(-180.0, longitude - lon_delta), min(180.0, longitude + lon_delta)
+
+        # Use the finest precision whose cells still cover the bounding box in a handful of lookups.
+        precision = 1
+        for candidate in range(INDEX_PRECISION, 0, -1):
+            cell_lat, cell_lon = geohash_cell_size(candidate)
+            rows = math.floor((max_lat + 90) / cell_lat) - math.floor((min_lat + 90) / cell_lat) + 1
+            columns = math.floor((max_lon + 180) / cell_lon) - math.floor((min_lon + 180) / cell_lon) + 1
+            if rows * columns <= MAX_QUERY_CELLS:
+                precision = candidate
+                break
+
+        cell_lat, cell_lon = geohash_cell_size(precision)
+        cells = set()
+        for row in range(math.floor((min_lat + 90) / cell_lat), math.floor((max_lat + 90) / cell_lat) + 1):
+            for column in range(math.floor((min_lon + 180) / cell_lon), math.floor((max_lon + 180) / cell_lon) + 1):
+                centre_lat = min(90.0, -90 + (row + 0.5) * cell_lat)
+                centre_lon = min(180.0, -180 + (column + 0.5) * cell_lon)
+                cells.add(geohash_encode(centre_lat, centre_lon, precision))
+
+        results = []
+        with self._lock:
+            for cell in cells:
+                for company_number in self._cells[precision].get(cell, ()):
+                    entry = self._entries[company_number]
+                    distance = haversine_km(latitude, longitude, entry["latitude"], entry["longitude"])
+                    if distance <= radius_km:
+                        results.append((distance, entry["record"]))
+
+        results.sort(key=lambda result: result[0])
+        return results
+
+
+spatial_index = SpatialIndex()
+
+
+def index_company(company_data, complete=True):
+    """
+    Index a company by the postcode of its registered office.
+
+    :param company_data: Company data in company profile shape.
+    :param complete: False for data built from search results; it never replaces an indexed full profile.
+    """
+    company_number = company_data.get("company_number")
+    location = geocode((company_data.get("registered_office_address") or {}).get("postal_code"))
+    if not company_number or location is None:
+        return
+    if not complete and spatial_index.get(company_number) is not None:
+        return
+    spatial_index.add(company_number, location[0], location[1], company_data)
@@ -0,0 +1,250 @@
+import hmac
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+from flask import Response, g, request
+
+# Profiling is opt-in per request with ?profile=1 (written to PROFILES_DIR) or ?profile=download (returned as
+# the response). It is honoured when PROFILING_ENABLED=1, or when the request carries PROFILE_ADMIN_TOKEN in
+# the X-Profile-Token header.
+PROFILING_ENABLED = os.environ.get("PROFILING_ENABLED") == "1"
+PROFILE_ADMIN_TOKEN = os.environ.get("PROFILE_ADMIN_TOKEN")
+PROFILES_DIR = os.environ.get("PROFILES_DIR", "profiles")
+
+SAMPLE_INTERVAL = 0.005
+TOP_STACKS = 30
+
+# Where a sample's time went, decided by the innermost frame whose module is one of these (or a submodule of
+# one). Full module names, so that e.g. http.server at the bottom of every request thread matches nothing.
+CATEGORIES = [
+    ("blocked in requests.get", ("requests", "urllib3", "http.client", "socket", "ssl")),
+    ("awaiting aiohttp", ("aiohttp", "asyncio", "selectors")),
+    ("format_payload", ()),
+    ("serialization", ("json", "csv", "exporters", "compression", "zlib", "brotli", "zstandard")),
+]
+
+
+def profiling_requested():
+    """
+    Whether the current request asked for profiling and is allowed to.
+    """
+    if request.args.get("profile") not in ("1", "download"):
+        return False
+    if PROFILING_ENABLED:
+        return True
+    token = request.headers.get("X-Profile-Token", "")
+    return bool(PROFILE_ADMIN_TOKEN) and hmac.compare_digest(token, PROFILE_ADMIN_TOKEN)
+
+
+def frame_module(frame):
+    return frame.f_globals.get("__name__", "") or ""
+
+
+def module_matches(module, names):
+    return any(module == name or module.startswith(name + ".") for name in names)
+
+
+def categorise(frames):
+    """
+    Category of a sample, given its frames from innermost to outermost.
+    """
+    for frame in frames:
+        if frame.f_code.co_name in ("format_payload", "project_payload"):
+            return "format_payload"
+        module = frame_module(frame)
+        for category, modules in CATEGORIES:
+            if module_matches(module, modules):
+                return category
+    return "other"
+
+
+_original_thread_start = threading.Thread.start
+
+
+def _tracked_thread_start(thread):
+    thread._started_by = threading.get_ident()
+    return _original_thread_start(thread)
+
+
+def track_thread_parents():
+    """
+    Record on every new thread which thread started it, so a profile can follow a request into its executors.
+    """
+    threading.Thread.start = _tracked_thread_start
+
+
+class SamplingProfiler:
+    """
+    Samples the stacks of a request's thread, and of the threads it starts (directly or through executors), at a
+    fixed interval. Other requests' threads are never sampled.
+
+    A sampler sees time spent blocked in I/O, which a deterministic profiler attributes poorly, and also
+    covers async views and thread pools that run outside the request thread.
+    """
+
+    def __init__(self, interval=SAMPLE_INTERVAL):
+        self.interval = interval
+        self.stacks = Counter()
+        self.categories = Counter()
+        self.samples = 0
+        self._thread_id = threading.get_ident()
+        self._stop = threading.Event()
+        self._sampler = None
+        self.started = self.stopped = None
+
+    def _watched_threads(self, threads):
+        """
+        The request thread plus every live thread descended from it.
+        """
+        watched = {self._thread_id}
+        parents = {thread.ident: getattr(thread, "_started_by", None) for thread in threads}
+        added = True
+        while added:
+            added = False
+            for thread_id, parent in parents.items():
+                if parent in watched and thread_id not in watched:
+                    watched.add(thread_id)
+                    added = True
+        return watched
+
+    def _sample(self):
+        sampler_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            threads = threading.enumerate()
+            names = {thread.ident: thread.name for thread in threads}
+            watched = self._watched_threads(threads)
+            watched.discard(sampler_id)
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id not in watched:
+                    continue
+
+                frames = []
+                while frame is not None:
+                    frames.append(frame)
+                    frame = frame.f_back
+
+                self.samples += 1
+                self.categories[categorise(frames)] += 1
+                stack = ";".join(
+                    f"{frame.f_code.co_name} ({frame_module(frame)}:{frame.f_lineno})" for frame in reversed(frames))
+                self.stacks[f"{names.get(thread_id, thread_id)};{stack}"] += 1
+
+    def start(self):
+        self.started = time.perf_counter()
+        self._sampler = threading.Thread(target=self._sample, name="request-profiler", daemon=True)
+        self._sampler.start()
+
+    def stop(self):
+        if self._sampler is not None:
+            self._stop.set()
+            self._sampler.join()
+            self._sampler = None
+            self.stopped = time.perf_counter()
+
+    def report(self, title):
+        """
+        Plain-text report: time per category, then the most frequent stacks.
+        """
+        duration = (self.stopped or time.perf_counter()) - self.started
+        lines = [title, f"Wall time: {duration * 1000:.1f} ms, {self.samples} samples every "
+                        f"{self.interval * 1000:.0f} ms", "", "Time by category:"]
+        for category, count in self.categories.most_common():
+            # Sleeps overshoot the interval, so scale by the measured wall time rather than count * interval.
+            share = count / max(1, self.samples)
+            lines.append(f"  {category:<28} {share:6.1%}  (~{share * duration * 1000:.0f} ms)")
+
+        lines += ["", f"Top {TOP_STACKS} stacks (innermost frame first):"]
+        for stack, count in self.stacks.most_common(TOP_STACKS):
+            lines.append(f"  {count:6d}  {' <- '.join(reversed(stack.split(';')[-4:]))}")
+        return "\n".join(lines) + "\n"
+
+    def collapsed(self):
+        """
+        Stacks in the collapsed format read by flamegraph tools.
+        """
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.items())
+
+
+class _ProfiledBody:
+    """
+    Response iterable that finishes the profile once a streamed body has been sent.
+    """
+
+    def __init__(self, iterable, on_close):
+        self.iterable = iterable
+        self.on_close = on_close
+
+    def __iter__(self):
+        return iter(self.iterable)
+
+    def close(self):
+        try:
+            if hasattr(self.iterable, "close"):
+                self.iterable.close()
+        finally:
+            self.on_close()
+
+
+def save_profile(profiler, title, endpoint):
+    os.makedirs(PROFILES_DIR, exist_ok=True)
+    name = f"{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}_{endpoint or 'request'}"
+    with open(os.path.join(PROFILES_DIR, f"{name}.txt"), "w", encoding="utf-8") as handle:
+        handle.write(profiler.report(title))
+    with open(os.path.join(PROFILES_DIR, f"{name}.collapsed"), "w", encoding="utf-8") as handle:
+        handle.write(profiler.collapsed())
+    print(f"Profile written to {os.path.join(PROFILES_DIR, name)}.txt")
+
+
+def init_app(app):
+    """
+    Register the opt-in request profiler on a Flask app.
+
+    Thread parents are only tracked when profiling can actually be requested, so apps that never profile keep
+    the stock Thread.start.
+    """
+    if PROFILING_ENABLED or PROFILE_ADMIN_TOKEN:
+        track_thread_parents()
+
+    @app.before_request
+    def start_profile():
+        if profiling_requested():
+            g.profiler = SamplingProfiler()
+            g.profiler.start()
+
+    @app.after_request
+    def finish_profile(response):
+        profiler = g.pop("profiler", None)
+        if profiler is None:
+            return response
+        title = f"{request.method} {request.full_path}"
+        endpoint = request.endpoint
+
+        if request.args.get("profile") == "download":
+            # Produce the whole body under the profiler, then return the report in its place.
+            response.get_data()
+            profiler.stop()
+            report = Response(profiler.report(title), mimetype="text/plain")
+            report.headers["Content-Disposition"] = "attachment; filename=profile.txt"
+            return report
+
+        def finish():
+            profiler.stop()
+            save_profile(profiler, title, endpoint)  # May run after the request context is gone
+
+        if response.is_streamed:
+            response.response = _ProfiledBody(response.response, finish)
+        else:
+            finish()
+        return response
+
+    @app.teardown_request
+    def stop_profile(error=None):
+        profiler = g.pop("profiler", None)
+        if profiler is not None:
+            profiler.stop()
+
+    return app
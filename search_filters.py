@@ -0,0 +1,102 @@
+import re
+
+# Query parameters accepted as filters on /search.
+FILTER_PARAMS = ("status", "type", "incorporated_from", "incorporated_to", "sic", "postcode_area")
+
+DATE_PATTERN = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+
+
+def parse_filters(args):
+    """
+    Read the filter parameters from a request's query string.
+
+    :param args: Mapping of query parameters (e.g. ``request.args``).
+    :return: Dict of the filters that were supplied, with normalised values.
+    """
+    filters = {}
+    for name in FILTER_PARAMS:
+        value = (args.get(name) or "").strip()
+        if not value:
+            continue
+
+        if name in ("status", "type"):
+            filters[name] = [part.strip().lower() for part in value.split(",") if part.strip()]
+        elif name in ("incorporated_from", "incorporated_to"):
+            if not DATE_PATTERN.match(value):
+                raise ValueError(f"{name} must be a date in YYYY-MM-DD format")
+            filters[name] = value
+        elif name == "postcode_area":
+            filters[name] = value.replace(" ", "").upper()
+        else:
+            filters[name] = value
+
+    if filters.get("incorporated_from", "") > filters.get("incorporated_to", "9999-99-99"):
+        raise ValueError("incorporated_from must not be after incorporated_to")
+    return filters
+
+
+def advanced_search_params(filters):
+    """
+    Translate filters into advanced-search API parameters.
+
+    Status, type and the incorporation date range map directly. A SIC filter is only pushed down when it is a
+    full five digit code, because the API matches whole codes; prefixes and postcode areas are evaluated locally.
+    """
+    params = {}
+    if "status" in filters:
+        params["company_status"] = ",".join(filters["status"])
+    if "type" in filters:
+        params["company_type"] = ",".join(filters["type"])
+    if "incorporated_from" in filters:
+        params["incorporated_from"] = filters["incorporated_from"]
+    if "incorporated_to" in filters:
+        params["incorporated_to"] = filters["incorporated_to"]
+    if len(filters.get("sic", "")) == 5:
+        params["sic_codes"] = filters["sic"]
+    return params
+
+
+def postcode_in_area(postcode, area):
+    """
+    Check a postcode against a postcode area ("SW") or a longer prefix such as an outward code ("SW1A").
+    """
+    postcode = postcode.replace(" ", "").upper()
+    if area.isalpha():
+        return re.match(r"[A-Z]*", postcode).group() == area
+    return postcode.startswith(area)
+
+
+def matches(company_data, filters):
+    """
+    Evaluate filters against company data in company profile shape.
+
+    :return: True or False, or None when a filtered field is missing and the full profile is needed to decide.
+    """
+    unknown = False
+
+    def check(value, test):
+        nonlocal unknown
+        if value is None or value == "":
+            unknown = True
+            return True
+        return test(value)
+
+    if "status" in filters and not check(company_data.get("company_status"),
+                                         lambda value: value.lower() in filters["status"]):
+        return False
+    if "type" in filters and not check(company_data.get("type"), lambda value: value.lower() in filters["type"]):
+        return False
+    if "incorporated_from" in filters and not check(company_data.get("date_of_creation"),
+                                                    lambda value: value >= filters["incorporated_from"]):
+        return False
+    if "incorporated_to" in filters and not check(company_data.get("date_of_creation"),
+                                                  lambda value: value <= filters["incorporated_to"]):
+        return False
+    if "sic" in filters and not check(company_data.get("sic_codes"),
+                                      lambda codes: any(code.startswith(filters["sic"]) for code in codes)):
+        return False
+    if "postcode_area" in filters and not check((company_data.get("registered_office_address") or {}).get("postal_code"),
+                                                lambda value: postcode_in_area(value, filters["postcode_area"])):
+        return False
+
+    return None if unknown else True
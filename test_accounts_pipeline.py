@@ -0,0 +1,46 @@
+import os
+
+import pytest
+
+os.environ.setdefault("COMPANIES_HOUSE_API_KEYS", "test-key")  # The key pool is built on import; no request is sent
+
+from accounts_pipeline import fact_value, parse_financials, run_pipeline
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "accounts")
+
+
+def test_parse_financials_reads_current_period():
+    row = parse_financials(os.path.join(FIXTURES_DIR, "01234567_2023-03-31.xhtml"))
+
+    assert row["company_number"] == "01234567"
+    assert row["made_up_date"] == "2023-03-31"
+    assert row["source"] == "ixbrl"
+    assert row["period_end"] == "2023-03-31"
+    assert row["turnover"] == 1_250_000
+    assert row["net_assets"] == -42_500  # Prior year and the dimensional share capital fact are ignored
+    assert row["employees"] == 12  # Tagged inside an ix:nonNumeric text block
+
+
+@pytest.mark.parametrize("format_name", ["ixt:numcommadecimal", "ixt:num-comma-decimal"])
+def test_fact_value_reads_comma_decimal_formats(format_name):
+    fact = {"attrs": {"format": format_name, "scale": "0"}, "text": "1.234.567,89"}
+
+    assert fact_value(fact) == pytest.approx(1_234_567.89)
+
+
+def test_run_pipeline_on_fixture_documents(tmp_path):
+    pytest.importorskip("pyarrow")
+    import pyarrow.parquet as pq
+
+    output = tmp_path / "financials.parquet"
+    profiles = {"01234567": {"company_name": "EXAMPLE TRADING LTD", "company_status": "active"}}
+    rows = run_pipeline(documents_dir=FIXTURES_DIR, output=str(output), profiles=profiles)
+
+    assert [row["source"] for row in rows] == ["ixbrl", "pdf"]
+
+    table = pq.read_table(output).to_pylist()
+    assert [row["company_number"] for row in table] == ["01234567", "07654321"]
+    assert table[0]["turnover"] == 1_250_000
+    assert table[0]["company_name"] == "EXAMPLE TRADING LTD"
+    assert table[1]["turnover"] is None
+    assert table[1]["company_name"] is None